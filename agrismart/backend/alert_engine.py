@@ -0,0 +1,277 @@
+import math
+import operator
+import threading
+import time
+from array import array
+
+NAN = float('nan')
+COMPARE = {'below': operator.lt, 'above': operator.gt}
+
+
+def _filled(typecode, n, value):
+    return array(typecode, [value]) * n
+
+
+class ThresholdRule:
+    """Fires while a reading is below/above a limit
+
+    The limit comes from the device's crop (``crop_bound`` names a range in
+    the crop database and which end of it) or falls back to ``threshold``.
+    """
+
+    def __init__(self, name, field, direction, threshold=None, crop_bound=None,
+                 cooldown=3600, severity='warning', message=None):
+        self.name = name
+        self.field = field
+        self.direction = direction
+        self.compare = COMPARE[direction]
+        self.threshold = NAN if threshold is None else threshold
+        self.crop_bound = crop_bound
+        self.cooldown = cooldown
+        self.severity = severity
+        self.message = message or f"{field} {direction} {{limit}}"
+
+    def limit_for(self, crop_requirements):
+        if self.crop_bound and crop_requirements:
+            range_field, end = self.crop_bound
+            return float(crop_requirements[range_field][end])
+        return self.threshold
+
+    def grow(self, n):
+        pass
+
+    def evaluate(self, slot, timestamp, value, limit):
+        return self.compare(value, limit)
+
+
+class SustainedRule(ThresholdRule):
+    """Fires once the threshold condition has held for ``duration`` seconds"""
+
+    def __init__(self, name, field, direction, duration, **kwargs):
+        super().__init__(name, field, direction, **kwargs)
+        self.duration = duration
+        self.since = array('d')
+
+    def grow(self, n):
+        self.since.extend(_filled('d', n, NAN))
+
+    def evaluate(self, slot, timestamp, value, limit):
+        if not self.compare(value, limit):
+            self.since[slot] = NAN
+            return False
+        if math.isnan(self.since[slot]):
+            self.since[slot] = timestamp
+        return timestamp - self.since[slot] >= self.duration
+
+
+class RateOfChangeRule(ThresholdRule):
+    """Fires when a field moves faster than ``threshold`` units per hour
+
+    ``trend`` limits it to 'falling' or 'rising' changes; by default either counts.
+    """
+
+    def __init__(self, name, field, threshold, trend=None, **kwargs):
+        super().__init__(name, field, 'above', threshold=threshold, **kwargs)
+        self.sign = {'falling': -1.0, 'rising': 1.0, None: 0.0}[trend]
+        self.last_value = array('d')
+        self.last_time = array('d')
+
+    def grow(self, n):
+        self.last_value.extend(_filled('d', n, NAN))
+        self.last_time.extend(_filled('d', n, NAN))
+
+    def evaluate(self, slot, timestamp, value, limit):
+        previous, previous_time = self.last_value[slot], self.last_time[slot]
+        self.last_value[slot] = value
+        self.last_time[slot] = timestamp
+        if math.isnan(previous) or timestamp <= previous_time:
+            return False
+        rate = (value - previous) / ((timestamp - previous_time) / 3600)
+        return (rate * self.sign if self.sign else abs(rate)) > limit
+
+
+class WindowMeanRule(ThresholdRule):
+    """Fires when the mean of the last ``window`` readings crosses the limit
+
+    Readings live in one flat ring buffer (``window`` doubles per device)
+    with a running sum, so each update is O(1).
+    """
+
+    def __init__(self, name, field, direction, window, **kwargs):
+        super().__init__(name, field, direction, **kwargs)
+        self.window = window
+        self.buffer = array('d')
+        self.total = array('d')
+        self.count = array('H')
+        self.position = array('H')
+
+    def grow(self, n):
+        self.buffer.extend(_filled('d', n * self.window, 0.0))
+        self.total.extend(_filled('d', n, 0.0))
+        self.count.extend(_filled('H', n, 0))
+        self.position.extend(_filled('H', n, 0))
+
+    def evaluate(self, slot, timestamp, value, limit):
+        index = slot * self.window + self.position[slot]
+        if self.count[slot] == self.window:
+            self.total[slot] -= self.buffer[index]
+        else:
+            self.count[slot] += 1
+        self.buffer[index] = value
+        self.total[slot] += value
+        self.position[slot] = (self.position[slot] + 1) % self.window
+        return self.count[slot] == self.window and self.compare(self.total[slot] / self.window, limit)
+
+
+def default_rules():
+    """Fresh rule instances; rules hold per-device state, so engines must not share them"""
+    return [
+        SustainedRule('low_soil_moisture', 'soil_moisture', 'below', duration=3 * 3600,
+                      crop_bound=('moisture_range', 0), threshold=30, severity='critical',
+                      message='Soil moisture below {limit}% for 3 hours, irrigate'),
+        WindowMeanRule('ph_drift_low', 'ph', 'below', window=12, crop_bound=('ph_range', 0), threshold=5.5,
+                       message='Average soil pH below {limit} over the last 12 readings'),
+        WindowMeanRule('ph_drift_high', 'ph', 'above', window=12, crop_bound=('ph_range', 1), threshold=8.0,
+                       message='Average soil pH above {limit} over the last 12 readings'),
+        # Falling only: a fast rise is what irrigation looks like
+        RateOfChangeRule('soil_moisture_drop', 'soil_moisture', threshold=10, trend='falling',
+                         message='Soil moisture falling faster than {limit}% per hour, check for leaks or sensor fault'),
+        ThresholdRule('heat_stress', 'temperature', 'above', threshold=40, severity='critical',
+                      message='Temperature above {limit}°C'),
+    ]
+
+
+class AlertEngine:
+    """Evaluates alert rules on each sensor reading as it arrives
+
+    Devices get a dense slot number on first sight. Per-rule limits, alert
+    state and rule windows are flat typed arrays indexed by slot, which keeps
+    100k devices to a few tens of MB and every reading O(rules).
+    """
+
+    def __init__(self, rules=None, crop_database=None, initial_capacity=1024):
+        self.rules = default_rules() if rules is None else list(rules)
+        self.crop_database = crop_database or {}
+        self.slots = {}
+        self.device_ids = []
+        self.device_crops = []
+        self.capacity = 0
+        self.limits = [array('d') for _ in self.rules]
+        self.active = [bytearray() for _ in self.rules]
+        self.last_fired = [array('d') for _ in self.rules]
+        self.stats = {'readings': 0, 'alerts': 0, 'suppressed': 0}
+        self._lock = threading.Lock()
+        self._grow(initial_capacity)
+
+    def _grow(self, n):
+        for i, rule in enumerate(self.rules):
+            rule.grow(n)
+            self.limits[i].extend(_filled('d', n, rule.limit_for(None)))
+            self.active[i].extend(bytes(n))
+            self.last_fired[i].extend(_filled('d', n, -math.inf))
+        self.capacity += n
+
+    def register_device(self, device_id, crop=None):
+        """Return the device's slot, (re)deriving its limits when a crop is given"""
+        slot = self.slots.get(device_id)
+        if slot is None:
+            slot = len(self.device_ids)
+            if slot == self.capacity:
+                self._grow(self.capacity)
+            self.slots[device_id] = slot
+            self.device_ids.append(device_id)
+            self.device_crops.append(None)
+        if crop is not None and crop != self.device_crops[slot]:
+            self.device_crops[slot] = crop
+            requirements = self.crop_database.get(crop)
+            for i, rule in enumerate(self.rules):
+                self.limits[i][slot] = rule.limit_for(requirements)
+        return slot
+
+    def process(self, reading, timestamp=None):
+        """Evaluate every rule on one reading and return the alerts it raises
+
+        An alert fires when a rule's condition becomes true. It does not
+        repeat while the condition holds, nor within the rule's cooldown; a
+        condition that returns during the cooldown alerts when the cooldown
+        ends if it still holds then.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        alerts = []
+        with self._lock:
+            slot = self.register_device(reading['device_id'], reading.get('crop'))
+            self.stats['readings'] += 1
+            for i, rule in enumerate(self.rules):
+                value = reading.get(rule.field)
+                if value is None:
+                    continue
+                limit = self.limits[i][slot]
+                if math.isnan(limit):
+                    continue
+
+                if not rule.evaluate(slot, timestamp, float(value), limit):
+                    self.active[i][slot] = 0
+                    continue
+                if self.active[i][slot]:
+                    continue
+                # Only a fired alert marks the condition active, so a suppressed
+                # one is checked against the cooldown again on the next reading
+                if timestamp - self.last_fired[i][slot] < rule.cooldown:
+                    self.stats['suppressed'] += 1
+                    continue
+
+                self.active[i][slot] = 1
+                self.last_fired[i][slot] = timestamp
+                self.stats['alerts'] += 1
+                alerts.append({
+                    'rule': rule.name,
+                    'device_id': reading['device_id'],
+                    'severity': rule.severity,
+                    'field': rule.field,
+                    'value': value,
+                    'limit': limit,
+                    'message': rule.message.format(limit=limit),
+                    'timestamp': timestamp
+                })
+        return alerts
+
+
+if __name__ == "__main__":
+    import random
+
+    n_devices = 100_000
+    n_readings = 1_000_000
+    crops = ['rice', 'wheat', 'cotton', 'sugarcane']
+    crop_database = {
+        'rice': {'ph_range': [5.5, 7.0], 'moisture_range': [40, 60], 'temp_range': [20, 35]},
+        'wheat': {'ph_range': [6.0, 7.5], 'moisture_range': [30, 50], 'temp_range': [15, 25]},
+        'cotton': {'ph_range': [5.8, 8.0], 'moisture_range': [35, 55], 'temp_range': [21, 32]},
+        'sugarcane': {'ph_range': [6.0, 7.5], 'moisture_range': [45, 65], 'temp_range': [26, 32]}
+    }
+
+    engine = AlertEngine(crop_database=crop_database)
+    rng = random.Random(42)
+    for i in range(n_devices):
+        engine.register_device(f'device_{i}', rng.choice(crops))
+
+    # Readings every 10 simulated minutes per device, round-robin across devices
+    readings = [{
+        'device_id': f'device_{i % n_devices}',
+        'soil_moisture': rng.uniform(25, 70),
+        'ph': rng.gauss(6.5, 0.8),
+        'temperature': rng.uniform(18, 42)
+    } for i in range(n_readings)]
+
+    start = time.perf_counter()
+    for i, reading in enumerate(readings):
+        engine.process(reading, timestamp=(i // n_devices) * 600.0)
+    elapsed = time.perf_counter() - start
+
+    state_bytes = sum(
+        len(a) * a.itemsize
+        for rule in engine.rules
+        for a in vars(rule).values() if isinstance(a, array)
+    ) + sum(len(a) * a.itemsize for a in engine.limits + engine.last_fired) + sum(map(len, engine.active))
+    print(f"{n_readings} readings over {n_devices} devices in {elapsed:.2f}s "
+          f"({n_readings / elapsed:,.0f} readings/s), alerts {engine.stats['alerts']}, "
+          f"suppressed {engine.stats['suppressed']}, rule state {state_bytes / 1e6:.1f} MB")
@@ -1,14 +1,25 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
+from werkzeug.utils import secure_filename
 import numpy as np
 import json
 from datetime import datetime, timedelta
 import random
 import os
+import time
+import io
+import math
 import google.generativeai as genai
 from config import Config
+from models import weather_predictor
+from knowledge_base import CropKnowledgeBase
+from suitability_index import SuitabilityIndex
+from job_queue import JobQueue, TERMINAL_STATUSES
+from farm_store import FarmStore, farm_id_for
+from alert_engine import AlertEngine
 
 app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = Config.MAX_FILE_SIZE
 CORS(app)
 
 # Configure Gemini AI
@@ -30,22 +41,33 @@ Always provide practical, actionable advice. Keep responses concise but informat
 Consider Indian farming conditions, monsoons, and local agricultural practices.
 """
 
+# Crop facts and pre-encoded crop/market responses, compiled once at startup
+# from the records Config already parsed
+knowledge_base = CropKnowledgeBase.load(Config.CROP_DATA_PATH, Config.SUPPORTED_LANGUAGES, crops=Config.CROPS)
+
+def compiled_response(compiled):
+    """Serve a pre-encoded response, honouring If-None-Match and gzip"""
+    use_gzip = compiled.gzip_body is not None and request.accept_encodings['gzip'] > 0
+    etag = compiled.gzip_etag if use_gzip else compiled.etag
+    
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(compiled.gzip_body if use_gzip else compiled.body, mimetype='application/json')
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    if compiled.gzip_body is not None:
+        response.vary.add('Accept-Encoding')
+    return response
+
 # Simulated ML Models and Data
 class AgriPredictor:
     def __init__(self):
-        self.crop_database = {
-            'rice': {'ph_range': [5.5, 7.0], 'moisture_range': [40, 60], 'temp_range': [20, 35]},
-            'wheat': {'ph_range': [6.0, 7.5], 'moisture_range': [30, 50], 'temp_range': [15, 25]},
-            'cotton': {'ph_range': [5.8, 8.0], 'moisture_range': [35, 55], 'temp_range': [21, 32]},
-            'sugarcane': {'ph_range': [6.0, 7.5], 'moisture_range': [45, 65], 'temp_range': [26, 32]}
-        }
-        
-        self.market_prices = {
-            'rice': {'current': 2500, 'trend': 'up', 'change': 5.2},
-            'wheat': {'current': 2200, 'trend': 'stable', 'change': 1.1},
-            'cotton': {'current': 7800, 'trend': 'up', 'change': 8.7},
-            'sugarcane': {'current': 350, 'trend': 'down', 'change': -2.3}
-        }
+        self.crop_database = knowledge_base.crop_database
+        self.market_prices = knowledge_base.market_prices
+        self.suitability_index = SuitabilityIndex.from_catalog(knowledge_base.crops)
 
     def get_soil_data(self, location):
         # Simulate soil data from satellite APIs
@@ -58,28 +80,24 @@ class AgriPredictor:
             'organic_matter': round(random.uniform(1.5, 4.0), 2)
         }
 
-    def predict_crops(self, location, soil_type, farm_size):
-        soil_data = self.get_soil_data(location)
+    def predict_crops(self, location, soil_type, farm_size, temperature=None, soil_data=None):
+        soil_data = soil_data or self.get_soil_data(location)
         suitable_crops = []
         
-        for crop, requirements in self.crop_database.items():
-            ph_score = 1 if requirements['ph_range'][0] <= soil_data['ph'] <= requirements['ph_range'][1] else 0.5
-            moisture_score = 1 if requirements['moisture_range'][0] <= soil_data['moisture'] <= requirements['moisture_range'][1] else 0.5
-            
-            suitability_score = (ph_score + moisture_score) / 2
+        # Each given condition scores 1 when in range and 0.5 otherwise
+        conditions = {'ph': soil_data['ph'], 'moisture': soil_data['moisture'], 'temperature': temperature}
+        for crop, suitability_score in self.suitability_index.suitability(conditions):
+            yield_estimate = self.estimate_yield(crop, farm_size, suitability_score)
+            profit_estimate = self.estimate_profit(crop, yield_estimate)
             
-            if suitability_score > 0.5:
-                yield_estimate = self.estimate_yield(crop, farm_size, suitability_score)
-                profit_estimate = self.estimate_profit(crop, yield_estimate)
-                
-                suitable_crops.append({
-                    'crop': crop,
-                    'suitability_score': round(suitability_score * 100, 1),
-                    'estimated_yield': yield_estimate,
-                    'estimated_profit': profit_estimate,
-                    'sustainability_score': round(random.uniform(75, 95), 1),
-                    'market_trend': self.market_prices[crop]['trend']
-                })
+            suitable_crops.append({
+                'crop': crop,
+                'suitability_score': round(suitability_score * 100, 1),
+                'estimated_yield': yield_estimate,
+                'estimated_profit': profit_estimate,
+                'sustainability_score': round(random.uniform(75, 95), 1),
+                'market_trend': self.market_prices.get(crop, {}).get('trend', 'unknown')
+            })
         
         return sorted(suitable_crops, key=lambda x: x['suitability_score'], reverse=True)
 
@@ -88,35 +106,96 @@ class AgriPredictor:
         return round(base_yields.get(crop, 2.0) * farm_size * suitability_score, 2)
 
     def estimate_profit(self, crop, yield_amount):
-        return round(yield_amount * self.market_prices[crop]['current'], 0)
+        # Market data is optional per variety; without a price there is no estimate
+        price = self.market_prices.get(crop, {}).get('current')
+        return round(yield_amount * price, 0) if price is not None else None
 
 # Initialize predictor
 predictor = AgriPredictor()
 
+# Sensor alert rules, with moisture/pH limits taken from each device's crop.
+# Rule windows, active flags and cooldowns live in this process, so every
+# reading from a device must reach the same process: run /api/sensor_data on a
+# single worker (see gunicorn.conf.py), otherwise each worker sees only part
+# of a device's readings.
+alert_engine = AlertEngine(crop_database=knowledge_base.crop_database)
+
+# Farm profiles and reusable analysis components
+farm_store = FarmStore(Config.DATABASE_URL)
+
+# Slow work runs in job_queue.py worker processes; the app only enqueues and polls
+job_queue = JobQueue(Config.JOB_QUEUE_DB)
+
 @app.route('/api/analyze_farm', methods=['POST'])
 def analyze_farm():
     data = request.json
     location = data.get('location')
     soil_type = data.get('soil_type')
     farm_size = float(data.get('farm_size', 1))
+    farm_id = data.get('farm_id') or farm_id_for(location, soil_type, farm_size)
     
+    # Each component is looked up by its inputs and only recomputed when they change
     # Get soil analysis
-    soil_data = predictor.get_soil_data(location)
+    soil_data, soil_key, soil_reused = farm_store.get_or_compute(
+        'soil', {'location': location},
+        lambda: predictor.get_soil_data(location)
+    )
+    
+    # Get weather forecast
+    weather_data, weather_key, weather_reused = farm_store.get_or_compute(
+        'weather', {'location': location, 'date': datetime.now().strftime('%Y-%m-%d')},
+        lambda: get_weather_forecast(location)
+    )
     
     # Get crop recommendations
-    crop_recommendations = predictor.predict_crops(location, soil_type, farm_size)
+    temperature = weather_data[0]['temperature']
+    crop_recommendations, crops_key, crops_reused = farm_store.get_or_compute(
+        'crops', {'soil': soil_key, 'soil_type': soil_type, 'farm_size': farm_size, 'temperature': temperature},
+        lambda: predictor.predict_crops(location, soil_type, farm_size, temperature, soil_data)
+    )
     
-    # Get weather forecast
-    weather_data = get_weather_forecast(location)
+    reused = [kind for kind, hit in (('soil', soil_reused), ('weather', weather_reused), ('crops', crops_reused)) if hit]
+    farm_store.record_analysis(
+        farm_id,
+        {'location': location, 'soil_type': soil_type, 'farm_size': farm_size},
+        {'soil': soil_key, 'weather': weather_key, 'crops': crops_key},
+        reused
+    )
     
     return jsonify({
         'status': 'success',
+        'farm_id': farm_id,
         'soil_analysis': soil_data,
         'crop_recommendations': crop_recommendations,
         'weather_forecast': weather_data,
+        'reused_components': reused,
         'analysis_timestamp': datetime.now().isoformat()
     })
 
+@app.route('/api/farms/<farm_id>/history', methods=['GET'])
+def get_farm_history(farm_id):
+    history = farm_store.history(farm_id, limit=request.args.get('limit', 20, type=int))
+    if history is None:
+        return jsonify({'status': 'error', 'message': 'Farm not found'}), 404
+    return jsonify({'status': 'success', **history})
+
+@app.route('/api/crops/suitable', methods=['GET'])
+def get_suitable_crops():
+    conditions = {
+        'ph': request.args.get('ph', type=float),
+        'moisture': request.args.get('moisture', type=float),
+        'temperature': request.args.get('temperature', type=float),
+        'season': request.args.get('season'),
+        'region': request.args.get('region')
+    }
+    matches = predictor.suitability_index.query(conditions, limit=request.args.get('limit', 20, type=int))
+    
+    return jsonify({
+        'status': 'success',
+        'conditions': {key: value for key, value in conditions.items() if value is not None},
+        'crops': [{'crop': crop, 'suitability_score': score} for crop, score in matches]
+    })
+
 @app.route('/api/detect_disease', methods=['POST'])
 def detect_disease():
     # Simulate ML disease detection
@@ -256,11 +335,7 @@ def get_emergency_fallback(user_message, language):
 
 @app.route('/api/market_data', methods=['GET'])
 def get_market_data():
-    return jsonify({
-        'status': 'success',
-        'market_prices': predictor.market_prices,
-        'last_updated': datetime.now().isoformat()
-    })
+    return compiled_response(knowledge_base.market_response)
 
 @app.route('/api/weather/<location>', methods=['GET'])
 def get_weather_by_location(location):
@@ -271,24 +346,145 @@ def get_weather_by_location(location):
         'weather_data': weather_data
     })
 
+# Either response format is built in memory; larger batches (a whole district)
+# go through a weather_forecast job, which writes the .npz under JOB_DATA_DIR
+MAX_BULK_LOCATIONS = 1000
+
+@app.route('/api/weather/bulk', methods=['POST'])
+def get_bulk_weather():
+    data = request.json or {}
+    locations = data.get('locations', [])
+    try:
+        days = int(data.get('days', 7))
+    except (TypeError, ValueError):
+        days = 0
+    
+    if not isinstance(locations, list) or not 1 <= len(locations) <= MAX_BULK_LOCATIONS or not 1 <= days <= Config.MAX_FORECAST_DAYS:
+        return jsonify({
+            'status': 'error',
+            'message': f'Provide 1-{MAX_BULK_LOCATIONS} locations and 1-{Config.MAX_FORECAST_DAYS} days; '
+                       f'submit a weather_forecast job for more locations'
+        }), 400
+    
+    forecast = weather_predictor.forecast(len(locations), days, Config.FORECAST_RANGES)
+    conditions = weather_predictor.classify_conditions(forecast)
+    
+    if data.get('format') == 'npz':
+        buffer = io.BytesIO()
+        weather_predictor.export_forecast(buffer, forecast, conditions, locations)
+        return Response(buffer.getvalue(), mimetype='application/octet-stream')
+    
+    return jsonify({
+        'status': 'success',
+        'locations': locations,
+        'start_date': datetime.now().strftime('%Y-%m-%d'),
+        'variables': list(weather_predictor.VARIABLES),
+        'forecast': forecast.tolist(),
+        'conditions': weather_predictor.CONDITIONS[conditions].tolist()
+    })
+
 def get_weather_forecast(location):
     # Simulate weather API data
-    forecasts = []
-    base_temp = random.randint(25, 35)
+    forecast = weather_predictor.forecast(1, 7, Config.FORECAST_RANGES)[0]
+    conditions = weather_predictor.CONDITIONS[weather_predictor.classify_conditions(forecast)]
+    today = datetime.now()
     
-    for i in range(7):
-        date = datetime.now() + timedelta(days=i)
-        temp = base_temp + random.randint(-5, 5)
-        
-        forecasts.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'temperature': temp,
-            'humidity': random.randint(60, 90),
-            'rainfall': random.randint(0, 20),
-            'condition': random.choice(['sunny', 'cloudy', 'rainy', 'partly_cloudy'])
-        })
+    return [{
+        'date': (today + timedelta(days=i)).strftime('%Y-%m-%d'),
+        'temperature': int(temp),
+        'humidity': int(humidity),
+        'rainfall': int(rainfall),
+        'condition': str(condition)
+    } for i, ((temp, humidity, rainfall), condition) in enumerate(zip(forecast, conditions))]
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    if 'image' in request.files:
+        # Multipart upload: the image is handed to the worker by a path under the job data directory
+        image = request.files['image']
+        filename = secure_filename(image.filename or '')
+        if '.' not in filename or filename.rsplit('.', 1)[1].lower() not in Config.ALLOWED_EXTENSIONS:
+            return jsonify({
+                'status': 'error',
+                'message': f"Image must be one of: {', '.join(sorted(Config.ALLOWED_EXTENSIONS))}"
+            }), 400
+        image_path = os.path.join(Config.UPLOAD_FOLDER, f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{filename}")
+        os.makedirs(os.path.join(Config.JOB_DATA_DIR, Config.UPLOAD_FOLDER), exist_ok=True)
+        image.save(os.path.join(Config.JOB_DATA_DIR, image_path))
+        data = request.form.to_dict()
+        data['kind'] = 'analyze_crop_image'
+        data['payload'] = {'image_path': image_path, 'question': data.get('question', "What disease or problem do you see in this crop?")}
+    else:
+        data = request.json or {}
     
-    return forecasts
+    try:
+        job_id = job_queue.submit(
+            data.get('kind'),
+            data.get('payload', {}),
+            priority=int(data.get('priority', 0)),
+            timeout=float(data.get('timeout', 300))
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    
+    return jsonify({
+        'status': 'success',
+        'job_id': job_id,
+        'status_url': f'/api/jobs/{job_id}'
+    }), 202
+
+@app.route('/api/jobs/metrics', methods=['GET'])
+def get_job_metrics():
+    return jsonify({
+        'status': 'success',
+        'metrics': job_queue.metrics()
+    })
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    return jsonify({'status': 'success', 'job': job})
+
+# A stream occupies a sync worker, so it is kept under gunicorn's 30s worker
+# timeout; the client then reconnects (EventSource does so on its own)
+SSE_HEARTBEAT_SECONDS = 10
+SSE_MAX_SECONDS = 25
+SSE_RETRY_MS = 1000
+
+@app.route('/api/jobs/<int:job_id>/events', methods=['GET'])
+def stream_job(job_id):
+    if job_queue.get(job_id) is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    
+    def events():
+        started = last_sent = time.monotonic()
+        last_status = None
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while True:
+            job = job_queue.get(job_id)
+            now = time.monotonic()
+            if job['status'] != last_status:
+                last_status = job['status']
+                last_sent = now
+                yield f"event: status\ndata: {json.dumps(job, default=str)}\n\n"
+            if job['status'] in TERMINAL_STATUSES:
+                return
+            if now - started >= SSE_MAX_SECONDS:
+                yield f"event: reconnect\ndata: {json.dumps({'job_id': job_id})}\n\n"
+                return
+            if now - last_sent >= SSE_HEARTBEAT_SECONDS:
+                last_sent = now
+                yield ": keepalive\n\n"
+            time.sleep(0.5)
+    
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+SENSOR_FIELDS = ('temperature', 'humidity', 'soil_moisture', 'ph')
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
 
 @app.route('/api/sensor_data', methods=['POST'])
 def receive_sensor_data():
@@ -296,6 +492,7 @@ def receive_sensor_data():
     # Store sensor data (in production, use database)
     sensor_data = {
         'device_id': data.get('device_id'),
+        'crop': data.get('crop'),
         'temperature': data.get('temperature'),
         'humidity': data.get('humidity'),
         'soil_moisture': data.get('soil_moisture'),
@@ -303,44 +500,35 @@ def receive_sensor_data():
         'timestamp': datetime.now().isoformat()
     }
     
+    # Everything is stored as sent; alert rules only see a usable device id,
+    # a crop name and finite numbers
+    alerts = []
+    device_id = sensor_data['device_id']
+    if isinstance(device_id, (str, int)) and not isinstance(device_id, bool):
+        reading = {field: sensor_data[field] for field in SENSOR_FIELDS if is_number(sensor_data[field])}
+        reading['device_id'] = device_id
+        if isinstance(sensor_data['crop'], str):
+            reading['crop'] = sensor_data['crop']
+        alerts = alert_engine.process(reading)
+    
     return jsonify({
         'status': 'success',
         'message': 'Sensor data received',
-        'data_stored': sensor_data
+        'data_stored': sensor_data,
+        'alerts': alerts
     })
 
 @app.route('/api/recommendations/<crop>', methods=['GET'])
 def get_crop_recommendations(crop):
-    recommendations = {
-        'rice': {
-            'planting_season': 'June-July',
-            'harvesting_season': 'November-December',
-            'water_requirements': 'High (1200-1500mm)',
-            'fertilizer_schedule': [
-                {'stage': 'Transplanting', 'fertilizer': 'NPK 10-26-26', 'quantity': '2 bags/acre'},
-                {'stage': 'Tillering', 'fertilizer': 'Urea', 'quantity': '1 bag/acre'},
-                {'stage': 'Panicle initiation', 'fertilizer': 'DAP', 'quantity': '0.5 bag/acre'}
-            ],
-            'pest_management': 'Monitor for stem borer, use pheromone traps'
-        },
-        'cotton': {
-            'planting_season': 'April-June',
-            'harvesting_season': 'October-February',
-            'water_requirements': 'Medium (800-1200mm)',
-            'fertilizer_schedule': [
-                {'stage': 'Sowing', 'fertilizer': 'NPK 12-32-16', 'quantity': '2 bags/acre'},
-                {'stage': 'Squaring', 'fertilizer': 'Urea', 'quantity': '1.5 bags/acre'},
-                {'stage': 'Flowering', 'fertilizer': 'Potash', 'quantity': '0.5 bag/acre'}
-            ],
-            'pest_management': 'Regular monitoring for bollworm, use IPM practices'
-        }
-    }
+    compiled = knowledge_base.recommendations_response(crop, request.args.get('lang', 'en'))
+    if compiled is None:
+        return jsonify({
+            'status': 'success',
+            'crop': crop,
+            'recommendations': {}
+        })
     
-    return jsonify({
-        'status': 'success',
-        'crop': crop,
-        'recommendations': recommendations.get(crop, {})
-    })
+    return compiled_response(compiled)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,242 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import Config
+
+BUCKET_FIELDS = ('district', 'crop', 'soil_band', 'weather_band', 'language')
+
+
+def soil_band(ph, moisture):
+    ph_band = 'acidic' if ph < 6.0 else 'alkaline' if ph > 7.5 else 'neutral'
+    moisture_band = 'dry' if moisture < 35 else 'wet' if moisture > 60 else 'moist'
+    return f'{ph_band}-{moisture_band}'
+
+
+def weather_band(temperature, rainfall):
+    temp_band = 'cool' if temperature < 20 else 'hot' if temperature > 30 else 'mild'
+    rain_band = 'rainy' if rainfall > 10 else 'dry'
+    return f'{temp_band}-{rain_band}'
+
+
+def bucket_key(farmer):
+    """Everything that goes into the prompt; farmers sharing it share one advisory"""
+    return (
+        farmer['district'].strip().lower(),
+        farmer['crop'].strip().lower(),
+        soil_band(float(farmer['soil_ph']), float(farmer['soil_moisture'])),
+        weather_band(float(farmer['temperature']), float(farmer.get('rainfall') or 0)),
+        farmer.get('language') or 'en'
+    )
+
+
+def bucket_id(key):
+    return hashlib.sha1('|'.join(key).encode()).hexdigest()[:12]
+
+
+def build_prompt(key):
+    district, crop, soil, weather, language = key
+    language_name = Config.SUPPORTED_LANGUAGES.get(language, 'English')
+    message = (
+        f"Give this week's advisory for {crop} farmers. Soil is {soil.replace('-', ' and ')}. "
+        f"Keep it short enough for an SMS and respond in {language_name}."
+    )
+    context = {'location': district, 'weather': weather.replace('-', ', ')}
+    return message, context
+
+
+def read_farmers(path):
+    if path.endswith('.jsonl'):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, newline='') as f:
+            yield from csv.DictReader(f)
+
+
+def synthetic_farmers(n_farmers, seed=42):
+    """Random farmers over a realistic number of distinct contexts"""
+    rng = random.Random(seed)
+    districts = [f'district_{i}' for i in range(40)]
+    crops = list(Config.CROP_INFO)
+    for i in range(n_farmers):
+        yield {
+            'farmer_id': str(i),
+            'district': rng.choice(districts),
+            'crop': rng.choice(crops),
+            'soil_ph': round(rng.uniform(5.5, 8.0), 1),
+            'soil_moisture': round(rng.uniform(30, 70), 1),
+            'temperature': rng.randint(18, 36),
+            'rainfall': rng.randint(0, 20),
+            'language': rng.choice(['en', 'hi', 'ta', 'mr'])
+        }
+
+
+def input_hash(bucket_ids):
+    """Run id for a set of contexts, so a checkpoint only resumes the same campaign"""
+    return hashlib.sha1('\n'.join(sorted(bucket_ids)).encode()).hexdigest()[:12]
+
+
+def load_checkpoint(path, run_id):
+    """Return {bucket_id: advice} for buckets finished by earlier attempts at this run
+
+    The first line of a checkpoint names the run it belongs to; resuming a
+    different run from it is refused rather than reusing unrelated advice.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, 'rb') as f:
+        data = f.read()
+    complete = data[:data.rfind(b'\n') + 1]
+    if len(complete) < len(data):
+        # A crash can leave a partial last line; cut it off so the next append
+        # starts on a fresh line, and that bucket is redone
+        with open(path, 'r+b') as f:
+            f.truncate(len(complete))
+
+    lines = complete.decode('utf-8').splitlines()
+    if not lines or not lines[0].strip():
+        return done
+    try:
+        found = json.loads(lines[0]).get('run')
+    except (json.JSONDecodeError, AttributeError):
+        found = None
+    if found != run_id:
+        raise ValueError(f"Checkpoint {path} belongs to run '{found}', not '{run_id}'; "
+                         f"use another checkpoint path or remove it")
+    for line in lines[1:]:
+        entry = json.loads(line)
+        done[entry['bucket']] = entry['advice']
+    return done
+
+
+class StubAdvisor:
+    """Offline stand-in for GeminiAgriculturalAI with a fixed latency"""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+
+    def get_agricultural_advice(self, user_message, context=None):
+        time.sleep(self.latency)
+        return {
+            'success': True,
+            'response': f"[stub] {context['location']}, {context['weather']}: {user_message}",
+            'source': 'stub'
+        }
+
+
+class BatchAdvisoryJob:
+    def __init__(self, advisor, checkpoint_path, max_workers=8, run_id=None):
+        self.advisor = advisor
+        self.checkpoint_path = checkpoint_path
+        self.max_workers = max_workers
+        self.run_id = run_id
+
+    def _generate(self, key):
+        message, context = build_prompt(key)
+        return self.advisor.get_agricultural_advice(message, context)
+
+    def run(self, farmers, output_path):
+        start = time.perf_counter()
+        buckets = {}
+        keys = {}
+        n_farmers = 0
+        for farmer in farmers:
+            key = bucket_key(farmer)
+            bid = bucket_id(key)
+            keys[bid] = key
+            buckets.setdefault(bid, []).append(farmer['farmer_id'])
+            n_farmers += 1
+
+        run_id = self.run_id or input_hash(buckets)
+        advisories = load_checkpoint(self.checkpoint_path, run_id)
+        resumed = sum(1 for bid in buckets if bid in advisories)
+        pending = [bid for bid in buckets if bid not in advisories]
+        failed = 0
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            with open(self.checkpoint_path, 'a') as checkpoint:
+                if checkpoint.tell() == 0:
+                    checkpoint.write(json.dumps({'run': run_id}) + '\n')
+                futures = {executor.submit(self._generate, keys[bid]): bid for bid in pending}
+                for future in as_completed(futures):
+                    bid = futures[future]
+                    result = future.result()
+                    if not result.get('success'):
+                        # Left out of the checkpoint so the next run retries it
+                        failed += 1
+                        continue
+                    advisories[bid] = result['response']
+                    checkpoint.write(json.dumps({
+                        'bucket': bid,
+                        'key': dict(zip(BUCKET_FIELDS, keys[bid])),
+                        'advice': result['response']
+                    }, ensure_ascii=False) + '\n')
+                    checkpoint.flush()
+                    os.fsync(checkpoint.fileno())
+        except BaseException:
+            # On a job timeout (or any error) drop the queued buckets instead of
+            # waiting for all of them; only calls already in flight finish
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
+
+        with open(output_path, 'w') as out:
+            for bid, farmer_ids in buckets.items():
+                if bid not in advisories:
+                    continue
+                for farmer_id in farmer_ids:
+                    out.write(json.dumps({
+                        'farmer_id': farmer_id,
+                        'bucket': bid,
+                        'advice': advisories[bid]
+                    }, ensure_ascii=False) + '\n')
+
+        elapsed = time.perf_counter() - start
+        generated = len(pending) - failed
+        return {
+            'run_id': run_id,
+            'farmers': n_farmers,
+            'buckets': len(buckets),
+            'dedup_ratio': round(n_farmers / len(buckets), 2) if buckets else 0,
+            'generated': generated,
+            'resumed_from_checkpoint': resumed,
+            'failed': failed,
+            'elapsed_seconds': round(elapsed, 2),
+            'advisories_per_minute': round(generated / elapsed * 60, 1) if elapsed else 0,
+            'farmers_covered_per_minute': round(
+                sum(len(buckets[bid]) for bid in pending if bid in advisories) / elapsed * 60, 1
+            ) if elapsed else 0
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate campaign advisories per farmer context bucket')
+    farmer_source = parser.add_mutually_exclusive_group(required=True)
+    farmer_source.add_argument('--farmers', help='CSV or JSONL with farmer_id, district, crop, soil_ph, '
+                                                 'soil_moisture, temperature, rainfall, language')
+    farmer_source.add_argument('--synthetic', type=int, metavar='FARMERS', help='generate random farmers')
+    parser.add_argument('--output', default='advisories.jsonl')
+    parser.add_argument('--checkpoint', default='advisories.checkpoint.jsonl')
+    parser.add_argument('--workers', type=int, default=8, help='concurrent model calls')
+    parser.add_argument('--run-id', help='campaign name for the checkpoint (default: hash of the farmer contexts)')
+    parser.add_argument('--stub', action='store_true', help='use an offline stub instead of Gemini')
+    args = parser.parse_args()
+
+    if args.stub:
+        advisor = StubAdvisor()
+    else:
+        from gemini_ai import gemini_ai as advisor
+
+    farmers = read_farmers(args.farmers) if args.farmers else synthetic_farmers(args.synthetic)
+    job = BatchAdvisoryJob(advisor, args.checkpoint, args.workers, args.run_id)
+    print(json.dumps(job.run(farmers, args.output), indent=2))
@@ -1,5 +1,6 @@
 import os
 from dotenv import load_dotenv
+from knowledge_base import load_crop_data, crop_info
 
 load_dotenv()
 
@@ -17,6 +18,11 @@ class Config:
     # Database Configuration (if using database)
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///agrismart.db')
     
+    # Background job queue (SQLite file shared by the web app and workers)
+    JOB_QUEUE_DB = os.getenv('JOB_QUEUE_DB', 'jobs.db')
+    # Job payload paths are resolved under this directory and may not leave it
+    JOB_DATA_DIR = os.getenv('JOB_DATA_DIR', 'job_data')
+    
     # ML Model Paths
     MODEL_PATH = 'models/'
     DISEASE_MODEL = os.path.join(MODEL_PATH, 'disease_detection.pkl')
@@ -27,6 +33,15 @@ class Config:
     MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
     
+    # Live forecast ranges (inclusive upper bounds become exclusive for numpy)
+    FORECAST_RANGES = {
+        'base_temp': (25, 36),
+        'temp_delta': (-5, 6),
+        'humidity': (60, 91),
+        'rainfall': (0, 21)
+    }
+    MAX_FORECAST_DAYS = 15
+    
     # Supported Languages
     SUPPORTED_LANGUAGES = {
         'en': 'English',
@@ -39,48 +54,16 @@ class Config:
         'kn': 'ಕನ್ನಡ'
     }
     
-    # Crop Database
-    CROP_INFO = {
-        'rice': {
-            'scientific_name': 'Oryza sativa',
-            'optimal_ph': [5.5, 7.0],
-            'water_requirement': 'High',
-            'growing_season': 'Kharif',
-            'maturity_period': '110-140 days'
-        },
-        'wheat': {
-            'scientific_name': 'Triticum aestivum',
-            'optimal_ph': [6.0, 7.5],
-            'water_requirement': 'Medium',
-            'growing_season': 'Rabi',
-            'maturity_period': '110-130 days'
-        },
-        'cotton': {
-            'scientific_name': 'Gossypium hirsutum',
-            'optimal_ph': [5.8, 8.0],
-            'water_requirement': 'Medium-High',
-            'growing_season': 'Kharif',
-            'maturity_period': '150-180 days'
-        },
-        'sugarcane': {
-            'scientific_name': 'Saccharum officinarum',
-            'optimal_ph': [6.0, 7.5],
-            'water_requirement': 'High',
-            'growing_season': 'Year-round',
-            'maturity_period': '10-12 months'
-        }
-    }
+    # Crop Database (single source of truth: data/crops/*.json)
+    CROP_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'crops')
+    CROPS = load_crop_data(CROP_DATA_PATH)
+    CROP_INFO = crop_info(CROPS)
     
     # Market Data Sources
     MARKET_APIS = {
         'agmarknet': 'https://api.data.gov.in/resource/9ef84268-d588-465a-a308-a864a43d0070',
         'commodity': 'https://api.commodityapi.com/v1',
-        'manual_prices': {
-            'rice': 2500,
-            'wheat': 2200,
-            'cotton': 7800,
-            'sugarcane': 350
-        }
+        'manual_prices': {name: record['market']['current'] for name, record in CROPS.items() if 'market' in record}
     }
 
 class DevelopmentConfig(Config):
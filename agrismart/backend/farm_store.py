@@ -0,0 +1,265 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS farms (
+    id TEXT PRIMARY KEY,
+    location TEXT,
+    soil_type TEXT,
+    farm_size REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS components (
+    kind TEXT NOT NULL,
+    input_key TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (kind, input_key)
+);
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    farm_id TEXT NOT NULL,
+    component_keys TEXT NOT NULL,
+    reused TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_farm ON analyses (farm_id, id);
+"""
+
+
+def sqlite_path(database_url):
+    if not database_url.startswith('sqlite:///'):
+        raise ValueError(f"Only sqlite:/// database URLs are supported, got '{database_url}'")
+    path = database_url[len('sqlite:///'):]
+    # A plain :memory: database would be private to each pooled connection
+    return 'file:agrismart?mode=memory&cache=shared' if path == ':memory:' else path
+
+
+def input_key(kind, inputs):
+    return hashlib.sha256(f'{kind}:{json.dumps(inputs, sort_keys=True)}'.encode()).hexdigest()[:32]
+
+
+class FarmStore:
+    """Farm profiles and analysis components in pooled, WAL-mode SQLite
+
+    Each analysis component (soil, weather, crop ranking) is stored under a
+    hash of its inputs, so a repeat analysis only recomputes the components
+    whose inputs changed. Writes are queued and committed in batches by one
+    writer thread; readers consult the unflushed queue first.
+
+    Connections and the writer thread belong to the process that opened them
+    and are created on first use, so a store built before gunicorn forks its
+    workers (preload_app) gives each worker its own.
+    """
+
+    def __init__(self, database_url, pool_size=4, batch_size=200, flush_interval=0.05):
+        self.path = sqlite_path(database_url)
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # Anything inherited across a fork is the parent's and is left alone
+            self.stats = {'rows_written': 0, 'transactions': 0}
+            self._pool = queue.Queue()
+            for _ in range(self.pool_size):
+                self._pool.put(self._open())
+            self._writer_conn = self._open()
+            self._writer_conn.executescript(SCHEMA)
+
+            self._writes = queue.Queue()
+            self._pending = {}
+            self._pending_lock = threading.Lock()
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+            self._pid = os.getpid()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, uri=self.path.startswith('file:'))
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @contextmanager
+    def connection(self):
+        self._ensure_started()
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def _write_loop(self):
+        while True:
+            batch = [self._writes.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._writes.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            batch = [item for item in batch if item is not None]
+            if batch:
+                try:
+                    with self._writer_conn:
+                        for sql, params, _ in batch:
+                            self._writer_conn.execute(sql, params)
+                    self.stats['rows_written'] += len(batch)
+                    self.stats['transactions'] += 1
+                except sqlite3.Error as e:
+                    print(f"Farm store write failed, dropping {len(batch)} rows: {e}")
+                with self._pending_lock:
+                    for _, _, pending_key in batch:
+                        if pending_key is not None:
+                            self._pending.pop(pending_key, None)
+            for _ in range(len(batch) + stop):
+                self._writes.task_done()
+            if stop:
+                return
+
+    def _enqueue(self, sql, params, pending_key=None):
+        self._ensure_started()
+        self._writes.put((sql, params, pending_key))
+
+    def flush(self):
+        """Block until every queued write is committed"""
+        self._ensure_started()
+        self._writes.join()
+
+    def close(self):
+        if self._pid == os.getpid() and self._writer.is_alive():
+            self._writes.put(None)
+            self._writer.join()
+
+    def get_component(self, kind, key):
+        self._ensure_started()
+        with self._pending_lock:
+            if (kind, key) in self._pending:
+                return self._pending[(kind, key)]
+        with self.connection() as conn:
+            row = conn.execute('SELECT result FROM components WHERE kind = ? AND input_key = ?',
+                               (kind, key)).fetchone()
+        return json.loads(row['result']) if row else None
+
+    def get_or_compute(self, kind, inputs, compute):
+        """Return (result, input_key, reused), computing only on a cache miss"""
+        key = input_key(kind, inputs)
+        result = self.get_component(kind, key)
+        if result is not None:
+            return result, key, True
+
+        result = compute()
+        # Round-trip through JSON so fresh and cached results look the same
+        result = json.loads(json.dumps(result, default=str))
+        self._ensure_started()
+        with self._pending_lock:
+            self._pending[(kind, key)] = result
+        self._enqueue(
+            'INSERT OR REPLACE INTO components (kind, input_key, inputs, result, created_at) VALUES (?, ?, ?, ?, ?)',
+            (kind, key, json.dumps(inputs, sort_keys=True), json.dumps(result), time.time()),
+            (kind, key)
+        )
+        return result, key, False
+
+    def record_analysis(self, farm_id, profile, component_keys, reused):
+        now = time.time()
+        self._enqueue(
+            'INSERT INTO farms (id, location, soil_type, farm_size, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(id) DO UPDATE SET location = excluded.location, soil_type = excluded.soil_type, '
+            'farm_size = excluded.farm_size, updated_at = excluded.updated_at',
+            (farm_id, profile.get('location'), profile.get('soil_type'), profile.get('farm_size'), now, now)
+        )
+        self._enqueue(
+            'INSERT INTO analyses (farm_id, component_keys, reused, created_at) VALUES (?, ?, ?, ?)',
+            (farm_id, json.dumps(component_keys), json.dumps(reused), now)
+        )
+
+    def history(self, farm_id, limit=20):
+        """Most recent analyses of a farm with their stored components"""
+        self.flush()
+        with self.connection() as conn:
+            farm = conn.execute('SELECT * FROM farms WHERE id = ?', (farm_id,)).fetchone()
+            if farm is None:
+                return None
+            rows = conn.execute('SELECT * FROM analyses WHERE farm_id = ? ORDER BY id DESC LIMIT ?',
+                                (farm_id, limit)).fetchall()
+
+        analyses = []
+        for row in rows:
+            keys = json.loads(row['component_keys'])
+            analyses.append({
+                'analysis_id': row['id'],
+                'created_at': row['created_at'],
+                'reused_components': json.loads(row['reused']),
+                'components': {kind: self.get_component(kind, key) for kind, key in keys.items()}
+            })
+        return {'farm': dict(farm), 'analyses': analyses}
+
+
+def farm_id_for(location, soil_type, farm_size):
+    return hashlib.sha256(f'{location}|{soil_type}|{farm_size}'.encode()).hexdigest()[:16]
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    def slow(value, seconds):
+        time.sleep(seconds)
+        return value
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    store = FarmStore(f'sqlite:///{path}', pool_size=8)
+    locations = [f'village_{i}' for i in range(500)]
+
+    def analyze(location, temperature):
+        # Compute costs stand in for soil lookup, forecast and crop ranking
+        start = time.perf_counter()
+        soil, soil_key, soil_reused = store.get_or_compute(
+            'soil', {'location': location}, lambda: slow({'ph': random.uniform(5.5, 8)}, 0.02))
+        weather, weather_key, weather_reused = store.get_or_compute(
+            'weather', {'location': location, 'temperature': temperature}, lambda: slow([temperature], 0.01))
+        crops, crops_key, crops_reused = store.get_or_compute(
+            'crops', {'soil': soil_key, 'temperature': temperature}, lambda: slow(['rice'], 0.02))
+        store.record_analysis(farm_id_for(location, 'loam', 1.0), {'location': location},
+                              {'soil': soil_key, 'weather': weather_key, 'crops': crops_key},
+                              [kind for kind, hit in (('soil', soil_reused), ('weather', weather_reused),
+                                                      ('crops', crops_reused)) if hit])
+        return time.perf_counter() - start
+
+    def run(label, temperature):
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            latencies = sorted(executor.map(lambda loc: analyze(loc, temperature), locations))
+        store.flush()
+        print(f"{label}: mean {sum(latencies) / len(latencies) * 1000:.1f}ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms")
+
+    run('first analysis', 30)
+    run('repeat, nothing changed', 30)
+    run('repeat, new weather', 31)
+    print(f"writes: {store.stats['rows_written']} rows in {store.stats['transactions']} transactions "
+          f"({store.stats['rows_written'] / max(store.stats['transactions'], 1):.1f} rows/commit)")
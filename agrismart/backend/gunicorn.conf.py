@@ -0,0 +1,35 @@
+import gc
+import os
+
+# AGRISMART_SHARED_MODELS=1 (default): the master loads the models once as
+# read-only memory maps and workers inherit them without copying.
+# AGRISMART_SHARED_MODELS=0: every worker loads private copies, as before.
+SHARED_MODELS = os.getenv('AGRISMART_SHARED_MODELS', '1') == '1'
+
+# Sensor alerts keep per-device state in memory, so /api/sensor_data needs a
+# single process. With several workers here, run a second single-worker
+# instance for ingest and have the proxy send /api/sensor_data to it:
+#   WEB_CONCURRENCY=1 BIND=127.0.0.1:5001 GUNICORN_PIDFILE=ingest.pid gunicorn -c gunicorn.conf.py app:app
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+preload_app = SHARED_MODELS
+pidfile = os.getenv('GUNICORN_PIDFILE', 'gunicorn.pid')
+
+
+def on_starting(server):
+    if SHARED_MODELS:
+        import models
+        models.preload_models(mmap=True)
+
+
+def pre_fork(server, worker):
+    if SHARED_MODELS:
+        # Keep the collector from touching (and so copying) inherited objects
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if not SHARED_MODELS:
+        import models
+        models.preload_models(mmap=False)
@@ -0,0 +1,326 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import signal
+import sqlite3
+import sys
+import time
+import traceback
+from contextlib import contextmanager
+
+from config import Config
+
+TERMINAL_STATUSES = ('succeeded', 'failed', 'timeout')
+
+# A timeout of 0 would disarm the job's alarm, and requeue_stale would then
+# hand the still-running job to a second worker, so timeouts are bounded
+MAX_TIMEOUT = 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    timeout REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, id);
+"""
+
+
+class JobTimeout(BaseException):
+    """Raised by SIGALRM; a BaseException so handlers' ``except Exception`` cannot swallow it"""
+
+
+def resolve_data_path(path):
+    """Absolute path of ``path`` inside Config.JOB_DATA_DIR, refusing anything outside it"""
+    root = os.path.realpath(Config.JOB_DATA_DIR)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Path '{path}' is outside the job data directory")
+    return resolved
+
+
+def analyze_crop_image_job(payload):
+    from PIL import Image
+    from gemini_ai import gemini_ai
+    with Image.open(payload['image_path']) as image:
+        image.load()
+        return gemini_ai.analyze_crop_image(image, payload.get('question', "What disease or problem do you see in this crop?"))
+
+
+def train_models_job(payload):
+    import train
+    return train.train(**payload)
+
+
+def batch_advisory_job(payload):
+    import batch_advisory
+    if payload.get('stub'):
+        advisor = batch_advisory.StubAdvisor()
+    else:
+        from gemini_ai import gemini_ai as advisor
+    job = batch_advisory.BatchAdvisoryJob(advisor, payload['checkpoint'], payload.get('workers', 8),
+                                          payload.get('run_id'))
+    return job.run(batch_advisory.read_farmers(payload['farmers']), payload['output'])
+
+
+def weather_forecast_job(payload):
+    """Forecast every location listed in a text file (one per line) into an .npz"""
+    from models import weather_predictor
+    days = payload.get('days', 7)
+    if not 1 <= days <= Config.MAX_FORECAST_DAYS:
+        raise ValueError(f'days must be between 1 and {Config.MAX_FORECAST_DAYS}')
+    with open(payload['locations'], encoding='utf-8') as f:
+        locations = [line.strip() for line in f if line.strip()]
+    forecast = weather_predictor.forecast(len(locations), days, Config.FORECAST_RANGES)
+    conditions = weather_predictor.classify_conditions(forecast)
+    with open(payload['output'], 'wb') as out:
+        weather_predictor.export_forecast(out, forecast, conditions, locations)
+    return {'locations': len(locations), 'days': days, 'output': payload['output']}
+
+
+HANDLERS = {
+    'analyze_crop_image': analyze_crop_image_job,
+    'train_models': train_models_job,
+    'batch_advisory': batch_advisory_job,
+    'weather_forecast': weather_forecast_job
+}
+
+# Accepted payload fields per job kind: name -> (type, required). 'path'
+# fields are resolved under Config.JOB_DATA_DIR. Anything else, such as
+# train's install flag, is rejected.
+PAYLOAD_FIELDS = {
+    'analyze_crop_image': {'image_path': ('path', True), 'question': (str, False)},
+    'train_models': {
+        'kind': (str, True), 'source': ('path', False), 'n_synthetic': (int, False),
+        'chunksize': (int, False), 'cv_folds': (int, False), 'cache_dir': ('path', False),
+        'seed': (int, False)
+    },
+    'batch_advisory': {
+        'farmers': ('path', True), 'output': ('path', True), 'checkpoint': ('path', True),
+        'workers': (int, False), 'stub': (bool, False), 'run_id': (str, False)
+    },
+    'weather_forecast': {'locations': ('path', True), 'output': ('path', True), 'days': (int, False)}
+}
+
+
+def clean_payload(kind, payload):
+    """Validate a payload against PAYLOAD_FIELDS, returning it with resolved paths"""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'")
+    if not isinstance(payload, dict):
+        raise ValueError('Job payload must be an object')
+    fields = PAYLOAD_FIELDS[kind]
+    unknown = set(payload) - set(fields)
+    if unknown:
+        raise ValueError(f"Field '{sorted(unknown)[0]}' is not allowed for {kind} jobs")
+
+    cleaned = {}
+    for name, (field_type, required) in fields.items():
+        if name not in payload:
+            if required:
+                raise ValueError(f"Field '{name}' is required for {kind} jobs")
+            continue
+        value = payload[name]
+        expected = str if field_type == 'path' else field_type
+        # bool is an int subclass, so check it explicitly
+        if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+            raise ValueError(f"Field '{name}' must be a {expected.__name__}")
+        cleaned[name] = resolve_data_path(value) if field_type == 'path' else value
+    return cleaned
+
+
+class JobQueue:
+    """Persistent priority queue of background jobs in SQLite"""
+
+    def __init__(self, path=Config.JOB_QUEUE_DB):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Autocommit mode; claims take an explicit write lock with BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            yield conn
+        finally:
+            conn.close()
+
+    def submit(self, kind, payload, priority=0, timeout=300):
+        payload = clean_payload(kind, payload)
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            raise ValueError('Job priority must be an integer')
+        if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) \
+                or not math.isfinite(timeout) or not 0 < timeout <= MAX_TIMEOUT:
+            raise ValueError(f'Job timeout must be between 0 and {MAX_TIMEOUT} seconds')
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT INTO jobs (kind, payload, priority, timeout, created_at) VALUES (?, ?, ?, ?, ?)',
+                (kind, json.dumps(payload), priority, timeout, time.time())
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker):
+        """Atomically take the highest-priority queued job, oldest first"""
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' ORDER BY priority DESC, id LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, started_at = ? WHERE id = ?",
+                        (worker, time.time(), row['id'])
+                    )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return row
+
+    def finish(self, job_id, status, result=None, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?',
+                (status, json.dumps(result, default=str) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def requeue_stale(self, grace=60):
+        """Requeue running jobs whose worker died without finishing them"""
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL "
+                "WHERE status = 'running' AND started_at + timeout + ? < ?",
+                (grace, time.time())
+            ).rowcount
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        if job['status'] == 'queued':
+            with self._connect() as conn:
+                job['queue_position'] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+                    "(priority > ? OR (priority = ? AND id < ?))",
+                    (job['priority'], job['priority'], job_id)
+                ).fetchone()[0] + 1
+        return job
+
+    def metrics(self, window=1000):
+        """Queue depth and wait/run times over the most recent jobs"""
+        now = time.time()
+        with self._connect() as conn:
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+            oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            recent = conn.execute(
+                'SELECT started_at - created_at, finished_at - started_at FROM jobs '
+                'WHERE started_at IS NOT NULL ORDER BY started_at DESC LIMIT ?',
+                (window,)
+            ).fetchall()
+
+        waits = sorted(row[0] for row in recent)
+        runs = sorted(row[1] for row in recent if row[1] is not None)
+
+        def summary(values):
+            if not values:
+                return {'mean': None, 'p50': None, 'p95': None}
+            return {
+                'mean': round(sum(values) / len(values), 3),
+                'p50': round(values[len(values) // 2], 3),
+                'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 3)
+            }
+
+        return {
+            'queue_depth': counts.get('queued', 0),
+            'running': counts.get('running', 0),
+            'status_counts': counts,
+            'oldest_queued_seconds': round(now - oldest, 3) if oldest else 0,
+            'wait_seconds': summary(waits),
+            'run_seconds': summary(runs)
+        }
+
+
+def _raise_timeout(signum, frame):
+    raise JobTimeout()
+
+
+def worker_loop(path, name, poll_interval=0.5):
+    """Run jobs until terminated; each job is bounded by its own timeout"""
+    queue = JobQueue(path)
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    while True:
+        job = queue.claim(name)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+
+        try:
+            signal.setitimer(signal.ITIMER_REAL, job['timeout'])
+            try:
+                result = HANDLERS[job['kind']](json.loads(job['payload']))
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        except JobTimeout:
+            queue.finish(job['id'], 'timeout', error=f"Exceeded {job['timeout']}s")
+        except Exception:
+            queue.finish(job['id'], 'failed', error=traceback.format_exc())
+        else:
+            queue.finish(job['id'], 'succeeded', result=result)
+
+
+def run_pool(path, n_workers, poll_interval=0.5):
+    """Start the worker processes and restart any that exit"""
+    queue = JobQueue(path)
+    queue.requeue_stale()
+    workers = {}
+    # Workers are not daemonic so jobs can start processes of their own
+    # (joblib falls back to one core inside a daemon), which means they must
+    # be stopped explicitly however the pool exits
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        while True:
+            for i in range(n_workers):
+                if i not in workers or not workers[i].is_alive():
+                    workers[i] = multiprocessing.Process(
+                        target=worker_loop, args=(path, f'{os.getpid()}-{i}', poll_interval)
+                    )
+                    workers[i].start()
+            time.sleep(5)
+            queue.requeue_stale()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in workers.values():
+            process.terminate()
+        for process in workers.values():
+            process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='AgriSmart background job workers')
+    parser.add_argument('--db', default=Config.JOB_QUEUE_DB)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    args = parser.parse_args()
+
+    run_pool(args.db, args.workers, args.poll_interval)
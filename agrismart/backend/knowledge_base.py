@@ -0,0 +1,113 @@
+import gzip
+import hashlib
+import json
+import os
+from collections import namedtuple
+from datetime import datetime
+
+# Bodies smaller than this are not worth compressing
+GZIP_MIN_SIZE = 512
+
+CompiledResponse = namedtuple('CompiledResponse', ['body', 'etag', 'gzip_body', 'gzip_etag'])
+
+
+def load_crop_data(path):
+    """Load crop records from a JSON file or every JSON file in a directory"""
+    if os.path.isdir(path):
+        files = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.json'))
+    else:
+        files = [path]
+
+    crops = {}
+    for file_path in files:
+        with open(file_path, encoding='utf-8') as f:
+            for name, record in json.load(f).items():
+                if name in crops:
+                    raise ValueError(f"Crop '{name}' is defined twice (again in {file_path})")
+                crops[name] = record
+    return crops
+
+
+def crop_info(crops):
+    """Agronomy summary per crop in the shape of Config.CROP_INFO"""
+    return {
+        name: {
+            'scientific_name': record['scientific_name'],
+            'optimal_ph': record['ph_range'],
+            'water_requirement': record['water_requirement'],
+            'growing_season': record['growing_season'],
+            'maturity_period': record['maturity_period']
+        } for name, record in crops.items()
+    }
+
+
+def compile_response(payload):
+    """Encode a payload once and attach strong ETags for both encodings"""
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    gzip_body = None
+    gzip_etag = None
+    if len(body) >= GZIP_MIN_SIZE:
+        # mtime=0 keeps the compressed bytes, and so the ETag, reproducible
+        gzip_body = gzip.compress(body, mtime=0)
+        gzip_etag = f'{digest}-gzip'
+    return CompiledResponse(body, digest, gzip_body, gzip_etag)
+
+
+class CropKnowledgeBase:
+    """Single source of crop facts, compiled into ready-to-send responses"""
+
+    def __init__(self, crops, languages, last_updated=None):
+        self.crops = crops
+        self.languages = list(languages)
+        # Tied to the data rather than process start so every worker agrees on ETags
+        self.last_updated = last_updated or datetime.now().isoformat()
+
+        self.crop_info = crop_info(crops)
+        self.crop_database = {
+            name: {
+                'ph_range': record['ph_range'],
+                'moisture_range': record['moisture_range'],
+                'temp_range': record['temp_range']
+            } for name, record in crops.items()
+        }
+        self.market_prices = {name: record['market'] for name, record in crops.items() if 'market' in record}
+
+        self._recommendations = {
+            (name, language): compile_response({
+                'status': 'success',
+                'crop': name,
+                'language': language,
+                'recommendations': self._localized_recommendations(record, language)
+            })
+            for name, record in crops.items()
+            for language in self.languages
+        }
+        self.market_response = compile_response({
+            'status': 'success',
+            'market_prices': self.market_prices,
+            'last_updated': self.last_updated
+        })
+
+    @classmethod
+    def load(cls, path, languages, crops=None):
+        """Build from the crop data at ``path``, reusing ``crops`` if it was already parsed"""
+        if os.path.isdir(path):
+            mtime = max([os.path.getmtime(os.path.join(path, name)) for name in os.listdir(path)] or [0])
+        else:
+            mtime = os.path.getmtime(path)
+        if crops is None:
+            crops = load_crop_data(path)
+        return cls(crops, languages, datetime.fromtimestamp(mtime).isoformat())
+
+    def _localized_recommendations(self, record, language):
+        recommendations = dict(record.get('recommendations', {}))
+        if recommendations:
+            recommendations.update(record.get('translations', {}).get(language, {}))
+        return recommendations
+
+    def recommendations_response(self, crop, language='en'):
+        """Compiled response for a crop, or None if the crop is unknown"""
+        if language not in self.languages:
+            language = 'en'
+        return self._recommendations.get((crop, language))
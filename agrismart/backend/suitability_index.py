@@ -0,0 +1,275 @@
+import bisect
+import heapq
+
+# Condition name -> (catalog range field, domain low, domain high, bucket width)
+RANGE_DIMENSIONS = {
+    'ph': ('ph_range', 3.0, 10.0, 0.1),
+    'moisture': ('moisture_range', 0.0, 100.0, 1.0),
+    'temperature': ('temp_range', -10.0, 50.0, 1.0)
+}
+
+# Catalog field -> condition name for set-valued constraints
+CATEGORY_DIMENSIONS = {'seasons': 'season', 'regions': 'region'}
+
+# A growing_season of this value means the crop fits every season
+ANY_SEASON = 'year-round'
+
+
+def iter_bits(mask):
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+class RangeDimension:
+    """Bucketed stabbing index over closed [low, high] ranges
+
+    Each bucket keeps two bitsets of variety ids: ranges covering the whole
+    bucket (a match for any value in it) and ranges only overlapping it
+    (checked exactly). A query is one bisect plus integer bit operations.
+    """
+
+    def __init__(self, low, high, step):
+        n_buckets = int(round((high - low) / step))
+        # Rounded so ranges given at the bucket resolution land on exact edges
+        self.edges = [round(low + i * step, 9) for i in range(n_buckets)]
+        self.full = [0] * n_buckets
+        self.partial = [0] * n_buckets
+
+    def _bucket(self, value):
+        return min(max(bisect.bisect_right(self.edges, value) - 1, 0), len(self.edges) - 1)
+
+    def _bounds(self, i):
+        # The outer buckets also catch values beyond the domain
+        low = self.edges[i] if i > 0 else float('-inf')
+        high = self.edges[i + 1] if i + 1 < len(self.edges) else float('inf')
+        return low, high
+
+    def add(self, bit, low, high):
+        for i in range(self._bucket(low), self._bucket(high) + 1):
+            bucket_low, bucket_high = self._bounds(i)
+            if low <= bucket_low and bucket_high <= high:
+                self.full[i] |= bit
+            else:
+                self.partial[i] |= bit
+
+    def remove(self, bit, low, high):
+        for i in range(self._bucket(low), self._bucket(high) + 1):
+            self.full[i] &= ~bit
+            self.partial[i] &= ~bit
+
+    def candidates(self, value):
+        i = self._bucket(value)
+        return self.full[i], self.partial[i]
+
+
+class SuitabilityIndex:
+    """Multi-dimensional suitability index over a crop variety catalog"""
+
+    def __init__(self):
+        self.ranges = {name: RangeDimension(*spec[1:]) for name, spec in RANGE_DIMENSIONS.items()}
+        self.categories = {name: {} for name in CATEGORY_DIMENSIONS.values()}
+        self.unconstrained = {name: 0 for name in CATEGORY_DIMENSIONS.values()}
+        self.records = []
+        self.ids = {}
+        self._free_ids = []
+        self.all_mask = 0
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        index = cls()
+        for name, record in catalog.items():
+            index.upsert(name, record)
+        return index
+
+    @staticmethod
+    def _normalize(record):
+        """Ranges plus lower-cased season/region sets for one catalog record"""
+        seasons = record.get('seasons')
+        if seasons is None and record.get('growing_season'):
+            seasons = [record['growing_season']]
+        seasons = {season.lower() for season in seasons or []}
+        if ANY_SEASON in seasons:
+            seasons = set()
+        entry = {field: tuple(record[field]) for field, *_ in RANGE_DIMENSIONS.values()}
+        entry['season'] = seasons
+        entry['region'] = {region.lower() for region in record.get('regions') or []}
+        return entry
+
+    def upsert(self, name, record):
+        """Insert a variety or replace its constraints in place"""
+        if name in self.ids:
+            self.remove(name)
+        variety_id = self._free_ids.pop() if self._free_ids else len(self.records)
+        if variety_id == len(self.records):
+            self.records.append(None)
+
+        entry = self._normalize(record)
+        entry['name'] = name
+        bit = 1 << variety_id
+        for condition, (field, *_) in RANGE_DIMENSIONS.items():
+            self.ranges[condition].add(bit, *entry[field])
+        for condition in self.categories:
+            if entry[condition]:
+                for value in entry[condition]:
+                    self.categories[condition][value] = self.categories[condition].get(value, 0) | bit
+            else:
+                self.unconstrained[condition] |= bit
+
+        self.records[variety_id] = entry
+        self.ids[name] = variety_id
+        self.all_mask |= bit
+
+    def remove(self, name):
+        variety_id = self.ids.pop(name)
+        entry = self.records[variety_id]
+        bit = 1 << variety_id
+        for condition, (field, *_) in RANGE_DIMENSIONS.items():
+            self.ranges[condition].remove(bit, *entry[field])
+        for condition in self.categories:
+            for value in entry[condition]:
+                self.categories[condition][value] &= ~bit
+            self.unconstrained[condition] &= ~bit
+
+        self.records[variety_id] = None
+        self._free_ids.append(variety_id)
+        self.all_mask &= ~bit
+
+    def _range_mask(self, condition, value, within=-1):
+        """Varieties (restricted to ``within``) whose range contains ``value``"""
+        full, partial = self.ranges[condition].candidates(value)
+        matched = full & within
+        field = RANGE_DIMENSIONS[condition][0]
+        for variety_id in iter_bits(partial & within):
+            low, high = self.records[variety_id][field]
+            if low <= value <= high:
+                matched |= 1 << variety_id
+        return matched
+
+    def _category_mask(self, condition, value):
+        return self.categories[condition].get(value.lower(), 0) | self.unconstrained[condition]
+
+    def match_masks(self, conditions):
+        """Bitset of matching varieties for each condition that was given"""
+        masks = {}
+        for condition, value in conditions.items():
+            if value is None:
+                continue
+            if condition in self.ranges:
+                masks[condition] = self._range_mask(condition, value)
+            elif condition in self.categories:
+                masks[condition] = self._category_mask(condition, value)
+            else:
+                raise KeyError(f"Unknown suitability condition '{condition}'")
+        return masks
+
+    def _closeness(self, entry, conditions):
+        # 1.0 at the centre of every given range, 0.0 at its edges
+        scores = []
+        for condition, (field, *_) in RANGE_DIMENSIONS.items():
+            if conditions.get(condition) is None:
+                continue
+            low, high = entry[field]
+            half_width = (high - low) / 2 or 1.0
+            scores.append(max(0.0, 1 - abs(conditions[condition] - (low + high) / 2) / half_width))
+        return sum(scores) / len(scores) if scores else 1.0
+
+    def query(self, conditions, limit=None):
+        """Varieties satisfying every condition, best-centred first"""
+        unknown = set(conditions) - set(self.ranges) - set(self.categories)
+        if unknown:
+            raise KeyError(f"Unknown suitability condition '{unknown.pop()}'")
+
+        # Category sets are exact and cheap, so they narrow the candidates
+        # before any range bucket needs an exact boundary check
+        fits = self.all_mask
+        for condition in self.categories:
+            if conditions.get(condition) is not None:
+                fits &= self._category_mask(condition, conditions[condition])
+        for condition in self.ranges:
+            if fits and conditions.get(condition) is not None:
+                fits = self._range_mask(condition, conditions[condition], fits)
+
+        scored = ((self.records[i]['name'], round(self._closeness(self.records[i], conditions) * 100, 1))
+                  for i in iter_bits(fits))
+        if limit:
+            return heapq.nlargest(limit, scored, key=lambda item: item[1])
+        return sorted(scored, key=lambda item: item[1], reverse=True)
+
+    def suitability(self, conditions, min_score=0.5):
+        """Score every variety matching at least one condition
+
+        Each given condition counts 1 when met and 0.5 when not, averaged, the
+        same scale AgriPredictor has always used. Returns (name, score) pairs
+        above ``min_score``, best first.
+        """
+        masks = list(self.match_masks(conditions).values())
+        if not masks:
+            return []
+
+        any_match = 0
+        for mask in masks:
+            any_match |= mask
+
+        scored = []
+        for variety_id in iter_bits(any_match):
+            matched = sum((mask >> variety_id) & 1 for mask in masks)
+            score = (matched + 0.5 * (len(masks) - matched)) / len(masks)
+            if score > min_score:
+                scored.append((self.records[variety_id]['name'], score))
+        return sorted(scored, key=lambda item: item[1], reverse=True)
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    rng = random.Random(42)
+    catalog = {}
+    for i in range(5000):
+        ph_low = round(rng.uniform(4.5, 7.0), 1)
+        moisture_low = rng.randint(20, 60)
+        temp_low = rng.randint(10, 28)
+        catalog[f'variety_{i}'] = {
+            'ph_range': [ph_low, round(ph_low + rng.uniform(0.5, 2.0), 1)],
+            'moisture_range': [moisture_low, moisture_low + rng.randint(10, 30)],
+            'temp_range': [temp_low, temp_low + rng.randint(5, 12)],
+            'seasons': rng.sample(['kharif', 'rabi', 'zaid'], rng.randint(1, 2)),
+            'regions': rng.sample(['north', 'south', 'east', 'west', 'central'], rng.randint(1, 3))
+        }
+
+    start = time.perf_counter()
+    index = SuitabilityIndex.from_catalog(catalog)
+    build = time.perf_counter() - start
+
+    queries = [{
+        'ph': round(rng.uniform(5.0, 8.0), 1),
+        'moisture': rng.uniform(30, 70),
+        'temperature': rng.uniform(15, 35),
+        'season': rng.choice(['kharif', 'rabi', 'zaid']),
+        'region': rng.choice(['north', 'south', 'east', 'west', 'central'])
+    } for _ in range(2000)]
+
+    start = time.perf_counter()
+    results = [index.query(conditions, limit=10) for conditions in queries]
+    indexed = (time.perf_counter() - start) / len(queries)
+
+    def scan(conditions):
+        return sorted(
+            name for name, record in catalog.items()
+            if all(record[field][0] <= conditions[condition] <= record[field][1]
+                   for condition, (field, *_) in RANGE_DIMENSIONS.items())
+            and conditions['season'] in record['seasons'] and conditions['region'] in record['regions']
+        )
+
+    start = time.perf_counter()
+    expected = [scan(conditions) for conditions in queries[:200]]
+    scanned = (time.perf_counter() - start) / 200
+    agree = all(
+        sorted(name for name, _ in index.query(conditions)) == names
+        for conditions, names in zip(queries[:200], expected)
+    )
+
+    print(f"{len(catalog)} varieties: build {build * 1000:.0f}ms, "
+          f"query {indexed * 1e6:.0f}us vs full scan {scanned * 1e6:.0f}us, matches scan: {agree}")
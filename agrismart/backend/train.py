@@ -0,0 +1,269 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import psutil
+import sklearn
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
+from sklearn.model_selection import KFold, cross_val_score
+
+from config import Config
+from models import synthetic_crop_data
+from tree_ensemble import compile_and_save, publish_dir
+
+CROP_FEATURES = ['ph', 'moisture', 'temperature', 'nitrogen', 'phosphorus', 'potassium']
+CROP_TARGETS = ['yield', 'suitability']
+DISEASE_FEATURES = [f'f{i}' for i in range(100)]
+DISEASE_TARGETS = ['label']
+DISEASE_CLASSES = 7
+
+# (artifact name as loaded by models.py, target column) for each model kind
+ARTIFACTS = {
+    'crop': [('yield_model', 'yield'), ('suitability_model', 'suitability')],
+    'disease': [('disease_model', 'label')]
+}
+
+
+def iter_source_chunks(source, columns, chunksize):
+    """Stream a CSV or Parquet file as float32 chunks with the given columns"""
+    if source.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(source)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()[columns].to_numpy(dtype=np.float32)
+    else:
+        import pandas as pd
+        for frame in pd.read_csv(source, usecols=columns, chunksize=chunksize):
+            yield frame[columns].to_numpy(dtype=np.float32)
+
+
+def iter_synthetic_chunks(kind, n_rows, chunksize, seed=42):
+    """Generate synthetic training rows chunk by chunk, features then targets"""
+    rng = np.random.RandomState(seed)
+    for start in range(0, n_rows, chunksize):
+        size = min(chunksize, n_rows - start)
+        if kind == 'crop':
+            X, y_yield, y_suitability = synthetic_crop_data(size, rng)
+            yield np.column_stack([X, y_yield, y_suitability]).astype(np.float32)
+        else:
+            X = rng.rand(size, len(DISEASE_FEATURES))
+            y = rng.randint(0, DISEASE_CLASSES, size)
+            yield np.column_stack([X, y]).astype(np.float32)
+
+
+def cache_key(kind, source, n_synthetic, chunksize, seed):
+    if source:
+        stat = os.stat(source)
+        identity = f'{kind}:{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}'
+    else:
+        # Rows are drawn chunk by chunk, so the chunk size changes the data too
+        identity = f'{kind}:synthetic:{n_synthetic}:{chunksize}:{seed}'
+    return hashlib.sha256(identity.encode()).hexdigest()[:16]
+
+
+def build_cache(chunks, cache_dir, n_features, n_targets):
+    """Append preprocessed chunks to raw float32 files and memory-map them
+
+    Rows with missing values are dropped. Features and targets go to separate
+    files so the feature matrix is C-contiguous and sklearn can fit on the map
+    without copying it. Only one chunk is held in memory at a time.
+    """
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    X_path = os.path.join(cache_dir, 'X.f32')
+    y_path = os.path.join(cache_dir, 'y.f32')
+    cache_hit = os.path.exists(meta_path)
+
+    if cache_hit:
+        with open(meta_path) as f:
+            n_rows = json.load(f)['rows']
+    else:
+        os.makedirs(cache_dir, exist_ok=True)
+        n_rows = 0
+        with open(X_path, 'wb') as X_file, open(y_path, 'wb') as y_file:
+            for chunk in chunks:
+                chunk = chunk[~np.isnan(chunk).any(axis=1)]
+                X_file.write(np.ascontiguousarray(chunk[:, :n_features]).tobytes())
+                y_file.write(np.ascontiguousarray(chunk[:, n_features:]).tobytes())
+                n_rows += len(chunk)
+        # The meta file is written last so an interrupted run never looks cached
+        with open(meta_path, 'w') as f:
+            json.dump({'rows': n_rows, 'features': n_features, 'targets': n_targets}, f)
+
+    X = np.memmap(X_path, dtype=np.float32, mode='r', shape=(n_rows, n_features))
+    y = np.memmap(y_path, dtype=np.float32, mode='r', shape=(n_rows, n_targets))
+    return X, y, cache_hit
+
+
+def make_estimator(kind):
+    if kind == 'crop':
+        # Boosting stages are sequential; parallelism comes from fitting the
+        # two crop models and the CV folds concurrently
+        return GradientBoostingRegressor(random_state=42)
+    return RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
+
+
+def fit_one(kind, X, y, cv_folds):
+    """Fit one model and optionally cross-validate it using every core"""
+    scores = []
+    if cv_folds > 1:
+        folds = KFold(n_splits=cv_folds, shuffle=True, random_state=42)
+        scores = cross_val_score(make_estimator(kind), X, y, cv=folds, n_jobs=-1).tolist()
+    model = make_estimator(kind)
+    model.fit(X, y)
+    if kind == 'disease':
+        # A threaded predict_proba sums trees in completion order; the saved
+        # model must sum them in order to match the compiled evaluator exactly
+        model.set_params(n_jobs=1)
+    return model, scores
+
+
+class MemorySampler:
+    """Track peak RSS of this process and its live children (joblib workers)
+
+    getrusage only reports children once they have exited and been reaped,
+    which misses the loky workers holding the CV fold copies, so RSS is
+    sampled from /proc while the fit runs.
+    """
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak_self = 0
+        self.peak_children = 0
+        self.peak_total = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self):
+        process = psutil.Process()
+        own = process.memory_info().rss
+        children = 0
+        for child in process.children(recursive=True):
+            try:
+                children += child.memory_info().rss
+            except psutil.NoSuchProcess:
+                continue
+        self.peak_self = max(self.peak_self, own)
+        self.peak_children = max(self.peak_children, children)
+        self.peak_total = max(self.peak_total, own + children)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self.sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def report(self):
+        return {
+            'peak_memory_mb': round(self.peak_self / 2 ** 20, 1),
+            'peak_worker_memory_mb': round(self.peak_children / 2 ** 20, 1),
+            'peak_total_memory_mb': round(self.peak_total / 2 ** 20, 1)
+        }
+
+
+def write_artifact(name, model, metadata, version):
+    """Save a model as models/<name>/<version>/ and point LATEST at it"""
+    artifact_dir = os.path.join(Config.MODEL_PATH, name, version)
+    os.makedirs(artifact_dir, exist_ok=True)
+    with open(os.path.join(artifact_dir, f'{name}.pkl'), 'wb') as f:
+        pickle.dump(model, f)
+    compile_and_save(model, os.path.join(artifact_dir, f'{name}.trees'), os.path.join(artifact_dir, f'{name}.pkl'))
+    with open(os.path.join(artifact_dir, 'metadata.json'), 'w') as f:
+        json.dump(metadata, f, indent=2)
+    with open(os.path.join(Config.MODEL_PATH, name, 'LATEST'), 'w') as f:
+        f.write(version)
+    return artifact_dir
+
+
+def install_artifact(name, artifact_dir):
+    """Copy an artifact to the paths models.py loads from
+
+    Both are swapped in whole, never rewritten, since running workers may
+    have the current trees memory-mapped.
+    """
+    shutil.copyfile(os.path.join(artifact_dir, f'{name}.pkl'), f'{name}.pkl.tmp')
+    os.replace(f'{name}.pkl.tmp', f'{name}.pkl')
+    staged = f'{name}.trees.v{time.time_ns()}'
+    shutil.copytree(os.path.join(artifact_dir, f'{name}.trees'), staged)
+    publish_dir(staged, f'{name}.trees')
+
+
+def train(kind, source=None, n_synthetic=0, chunksize=500_000, cache_dir='cache', cv_folds=3, install=False,
+          seed=42):
+    features = CROP_FEATURES if kind == 'crop' else DISEASE_FEATURES
+    targets = CROP_TARGETS if kind == 'crop' else DISEASE_TARGETS
+    timings = {}
+
+    with MemorySampler() as sampler:
+        start = time.perf_counter()
+        if source:
+            chunks = iter_source_chunks(source, features + targets, chunksize)
+        else:
+            chunks = iter_synthetic_chunks(kind, n_synthetic, chunksize, seed)
+        cache_path = os.path.join(cache_dir, cache_key(kind, source, n_synthetic, chunksize, seed))
+        X, y, cache_hit = build_cache(chunks, cache_path, len(features), len(targets))
+        timings['load_seconds'] = round(time.perf_counter() - start, 2)
+
+        start = time.perf_counter()
+        jobs = [(name, np.asarray(y[:, targets.index(target)])) for name, target in ARTIFACTS[kind]]
+        if kind == 'disease':
+            jobs = [(name, labels.astype(np.int64)) for name, labels in jobs]
+        fitted = Parallel(n_jobs=len(jobs), prefer='threads')(
+            delayed(fit_one)(kind, X, labels, cv_folds) for _, labels in jobs
+        )
+        timings['fit_seconds'] = round(time.perf_counter() - start, 2)
+
+    version = datetime.now().strftime('%Y%m%d-%H%M%S')
+    report = {
+        'kind': kind,
+        'version': version,
+        'source': source or f'synthetic:{n_synthetic}',
+        'rows': int(X.shape[0]),
+        'features': features,
+        'cache_hit': cache_hit,
+        'timings': timings,
+        'wall_clock_seconds': round(sum(timings.values()), 2),
+        **sampler.report(),
+        'sklearn_version': sklearn.__version__
+    }
+    artifacts = {}
+    for (name, _), (model, scores) in zip(jobs, fitted):
+        artifact_dir = write_artifact(name, model, dict(report, cv_scores=scores), version)
+        artifacts[name] = {'artifact': artifact_dir, 'cv_scores': scores}
+        if install:
+            install_artifact(name, artifact_dir)
+    report['models'] = artifacts
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Out-of-core training for AgriSmart models')
+    parser.add_argument('kind', choices=['crop', 'disease'])
+    data_source = parser.add_mutually_exclusive_group(required=True)
+    data_source.add_argument('--source', help='CSV or Parquet file with feature and target columns')
+    data_source.add_argument('--synthetic', type=int, metavar='ROWS', help='generate this many synthetic rows')
+    parser.add_argument('--chunksize', type=int, default=500_000)
+    parser.add_argument('--seed', type=int, default=42, help='random seed for --synthetic rows')
+    parser.add_argument('--cache-dir', default='cache')
+    parser.add_argument('--cv', type=int, default=3, help='cross-validation folds (0 to skip)')
+    parser.add_argument('--install', action='store_true', help='copy the new artifacts to the paths models.py loads')
+    args = parser.parse_args()
+
+    result = train(args.kind, args.source, args.synthetic or 0, args.chunksize, args.cache_dir, args.cv, args.install,
+                   args.seed)
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+ARRAY_FIELDS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def publish_dir(staged, path, keep=2):
+    """Atomically point ``path`` (a symlink) at the fully written directory ``staged``
+
+    Files that running workers have memory-mapped are never rewritten, and a
+    loader resolves the link once, so it sees one complete version. The
+    ``keep`` newest versions stay on disk for loads still resolving the
+    previous one.
+    """
+    if os.path.isdir(path) and not os.path.islink(path):
+        # Saved before versioned directories; unlinking leaves existing maps intact
+        shutil.rmtree(path)
+    link = f'{path}.link-{os.getpid()}'
+    os.symlink(os.path.basename(staged), link)
+    os.replace(link, path)
+
+    parent = os.path.dirname(path) or '.'
+    prefix = os.path.basename(path) + '.v'
+    current = os.path.realpath(path)
+    versions = sorted(
+        (entry for entry in os.scandir(parent)
+         if entry.name.startswith(prefix) and entry.is_dir(follow_symlinks=False)),
+        key=lambda entry: entry.stat().st_mtime_ns, reverse=True
+    )
+    for entry in versions[keep:]:
+        if os.path.realpath(entry.path) != current:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+class CompiledTreeEnsemble:
+    """Tree ensemble flattened into contiguous arrays for fast inference.
+
+    All trees share one node table. Leaves point to themselves, so every row
+    walks exactly ``max_depth`` steps and the whole ensemble is evaluated with
+    a handful of vectorized gathers instead of one Python call per tree.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, meta):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.kind = meta['kind']
+        self.n_features = meta['n_features']
+        self.max_depth = meta['max_depth']
+        self.base = np.asarray(meta.get('base', [0.0]), dtype=np.float64)
+        self.classes_ = np.asarray(meta['classes']) if 'classes' in meta else None
+        # sha256 of the pickle this was compiled from, when known
+        self.source_digest = meta.get('source_sha256')
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Compile a fitted RandomForestClassifier or GradientBoostingRegressor"""
+        if hasattr(model, 'classes_'):
+            trees = list(model.estimators_)
+            meta = {'kind': 'classifier', 'classes': model.classes_.tolist()}
+            scale = 1.0
+        else:
+            trees = [stage[0] for stage in model.estimators_]
+            meta = {'kind': 'regressor'}
+            scale = model.learning_rate
+            if model.init_ == 'zero':
+                meta['base'] = [0.0]
+            else:
+                dummy = np.zeros((1, model.n_features_in_))
+                meta['base'] = [float(np.ravel(model.init_.predict(dummy))[0])]
+        meta['n_features'] = int(model.n_features_in_)
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in trees:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(offset, offset + n_nodes, dtype=np.int32)
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold).astype(np.float64))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32))
+
+            value = tree.value[:, 0, :].astype(np.float64)
+            if meta['kind'] == 'classifier':
+                # Same normalisation DecisionTreeClassifier.predict_proba applies
+                normalizer = value.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                value = value / normalizer
+            else:
+                value = scale * value
+            values.append(value)
+
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n_nodes
+        meta['max_depth'] = int(max_depth)
+
+        return cls(
+            np.concatenate(features),
+            np.concatenate(thresholds),
+            np.concatenate(lefts),
+            np.concatenate(rights),
+            np.concatenate(values),
+            np.asarray(roots, dtype=np.int32),
+            meta
+        )
+
+    def _leaf_values(self, X):
+        # sklearn evaluates trees on float32 inputs; match it for identical splits
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node]
+
+    def predict_proba(self, X):
+        if self.kind != 'classifier':
+            raise AttributeError("predict_proba is only available for classifiers")
+        # cumsum adds trees strictly in order, like the forest's accumulator
+        total = np.cumsum(self._leaf_values(X), axis=1)[:, -1, :]
+        return total / len(self.roots)
+
+    def predict(self, X):
+        if self.kind == 'classifier':
+            return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+        leaves = self._leaf_values(X)[:, :, 0]
+        base = np.full((leaves.shape[0], 1), self.base[0])
+        return np.cumsum(np.hstack([base, leaves]), axis=1)[:, -1]
+
+    def save(self, path):
+        """Write one .npy file per array plus a JSON header, published at ``path``
+
+        Each save goes to a new ``<path>.v<timestamp>`` directory that ``path``
+        is then switched to, so processes serving the previous arrays keep them.
+        """
+        staged = f'{path}.v{time.time_ns()}'
+        os.makedirs(staged)
+        for name in ARRAY_FIELDS:
+            np.save(os.path.join(staged, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+
+        meta = {
+            'kind': self.kind,
+            'n_features': self.n_features,
+            'max_depth': self.max_depth,
+            'base': self.base.tolist()
+        }
+        if self.classes_ is not None:
+            meta['classes'] = self.classes_.tolist()
+        if self.source_digest:
+            meta['source_sha256'] = self.source_digest
+        with open(os.path.join(staged, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        publish_dir(staged, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a saved ensemble; arrays are memory-mapped read-only by default"""
+        path = os.path.realpath(path)
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        mode = 'r' if mmap else None
+        arrays = [np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mode) for name in ARRAY_FIELDS]
+        return cls(*arrays, meta)
+
+
+def compile_and_save(model, path, source=None):
+    """Compile a fitted sklearn ensemble and persist it next to its pickle
+
+    ``source`` is that pickle; its hash is recorded so a replaced pickle is
+    noticed and recompiled.
+    """
+    compiled = CompiledTreeEnsemble.from_sklearn(model)
+    if source is not None:
+        compiled.source_digest = file_digest(source)
+    compiled.save(path)
+    return compiled
+
+
+if __name__ == "__main__":
+    import pickle
+    import time
+
+    for pkl_path in ('disease_model.pkl', 'yield_model.pkl', 'suitability_model.pkl'):
+        if not os.path.exists(pkl_path):
+            continue
+
+        start = time.perf_counter()
+        with open(pkl_path, 'rb') as f:
+            model = pickle.load(f)
+        pickle_load = time.perf_counter() - start
+
+        trees_path = pkl_path.replace('.pkl', '.trees')
+        compile_and_save(model, trees_path, pkl_path)
+        start = time.perf_counter()
+        compiled = CompiledTreeEnsemble.load(trees_path)
+        compiled_load = time.perf_counter() - start
+
+        X = np.random.rand(1000, model.n_features_in_)
+        if compiled.kind == 'classifier':
+            identical = np.array_equal(model.predict_proba(X), compiled.predict_proba(X))
+            predict_sk, predict_compiled = model.predict_proba, compiled.predict_proba
+        else:
+            identical = np.array_equal(model.predict(X), compiled.predict(X))
+            predict_sk, predict_compiled = model.predict, compiled.predict
+
+        row = X[:1]
+        runs = 200
+        start = time.perf_counter()
+        for _ in range(runs):
+            predict_sk(row)
+        sk_latency = (time.perf_counter() - start) / runs
+        start = time.perf_counter()
+        for _ in range(runs):
+            predict_compiled(row)
+        compiled_latency = (time.perf_counter() - start) / runs
+
+        print(f"{pkl_path}: identical={identical} "
+              f"load {pickle_load * 1000:.1f}ms -> {compiled_load * 1000:.1f}ms, "
+              f"1-row predict {sk_latency * 1e6:.0f}us -> {compiled_latency * 1e6:.0f}us")